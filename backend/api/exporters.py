@@ -0,0 +1,118 @@
+import csv
+import io
+import os
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.exceptions import ValidationError
+
+
+class Echo:
+    """Псевдо-буфер: csv.writer пишет строку и сразу получает её обратно"""
+
+    def write(self, value):
+        return value
+
+
+class BaseExporter:
+    """Базовый экспорт списка покупок"""
+    format = None
+    content_type = None
+
+    @property
+    def filename(self):
+        return f'shopping_cart.{self.format}'
+
+    @staticmethod
+    def line(item):
+        return (
+            f'{item["ingredients__name"]} '
+            f'({item["ingredients__measurement_unit"]}) – '
+            f'{item["amount"]}'
+        )
+
+    def stream(self, ingredients):
+        raise NotImplementedError
+
+
+class TxtExporter(BaseExporter):
+    format = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    def stream(self, ingredients):
+        for number, item in enumerate(ingredients):
+            yield ('\n' if number else '') + self.line(item)
+
+
+class CsvExporter(BaseExporter):
+    format = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+    header = ('Ингредиент', 'Единица измерения', 'Количество')
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield '\ufeff' + writer.writerow(self.header)
+        for item in ingredients:
+            yield writer.writerow((
+                item['ingredients__name'],
+                item['ingredients__measurement_unit'],
+                item['amount'],
+            ))
+
+
+class PdfExporter(BaseExporter):
+    """PDF отдаётся одним куском: таблица ссылок пишется в конце файла"""
+    format = 'pdf'
+    content_type = 'application/pdf'
+    font_name = 'ShoppingCartFont'
+    font_size = 12
+    margin = 50
+    title = 'Список покупок'
+
+    def get_font(self):
+        if self.font_name in pdfmetrics.getRegisteredFontNames():
+            return self.font_name
+        path = settings.PDF_FONT_PATH
+        if not os.path.exists(path):
+            return 'Helvetica'
+        pdfmetrics.registerFont(TTFont(self.font_name, path))
+        return self.font_name
+
+    def stream(self, ingredients):
+        buffer = io.BytesIO()
+        font = self.get_font()
+        width, height = A4
+        step = self.font_size * 1.5
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        pdf.setTitle(self.title)
+        pdf.setFont(font, self.font_size + 4)
+        pdf.drawString(self.margin, height - self.margin, self.title)
+        pdf.setFont(font, self.font_size)
+        y = height - self.margin - step * 2
+        for item in ingredients:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(font, self.font_size)
+                y = height - self.margin
+            pdf.drawString(self.margin, y, f'• {self.line(item)}')
+            y -= step
+        pdf.save()
+        yield buffer.getvalue()
+
+
+EXPORTERS = {
+    exporter.format: exporter
+    for exporter in (TxtExporter, CsvExporter, PdfExporter)
+}
+
+
+def get_exporter(export_format):
+    exporter = EXPORTERS.get(export_format or TxtExporter.format)
+    if exporter is None:
+        raise ValidationError({
+            'format': f'Доступные форматы: {", ".join(EXPORTERS)}'
+        })
+    return exporter()
@@ -1,6 +1,9 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredients, Recipes, Tags
+from recipes.models import (Favorite, Ingredients, Recipes, ShoppingList, Tags,
+                            TagsRecipes)
+from recipes.search import search_recipes
 
 
 class IngredientFilter(filters.FilterSet):
@@ -12,26 +15,61 @@ class IngredientFilter(filters.FilterSet):
 
 
 class RecipeFilter(filters.FilterSet):
+    TAGS_ANY = "any"
+    TAGS_ALL = "all"
+
     tags = filters.ModelMultipleChoiceFilter(
         queryset=Tags.objects.all(),
         field_name='tags__slug',
-        to_field_name='slug'
+        to_field_name='slug',
+        method="filter_tags",
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=((TAGS_ANY, "Любой из тегов"), (TAGS_ALL, "Все теги")),
+        method="filter_tags_mode",
     )
     is_favorited = filters.BooleanFilter(method="filter_is_favorited")
     is_in_shopping_cart = filters.BooleanFilter(
         method="filter_is_in_shopping_cart"
     )
+    search = filters.CharFilter(method="filter_search")
 
     class Meta:
         model = Recipes
-        fields = ("tags", "author", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "tags", "tags_mode", "author", "is_favorited",
+            "is_in_shopping_cart", "search"
+        )
 
-    def filter_is_favorited(self, queryset, name, value):
-        if value:
-            return queryset.filter(favorite__user=self.request.user)
+    def filter_tags(self, queryset, name, value):
+        """Подзапросы EXISTS вместо JOIN: рецепты не дублируются"""
+        tag_ids = {tag.id for tag in value}
+        if not tag_ids:
+            return queryset
+        if self.form.cleaned_data.get("tags_mode") == self.TAGS_ALL:
+            for tag_id in tag_ids:
+                queryset = queryset.filter(Exists(TagsRecipes.objects.filter(
+                    recipe=OuterRef("pk"), tag_id=tag_id)))
+            return queryset
+        return queryset.filter(Exists(TagsRecipes.objects.filter(
+            recipe=OuterRef("pk"), tag_id__in=tag_ids)))
+
+    def filter_tags_mode(self, queryset, name, value):
         return queryset
 
+    def filter_user_relation(self, queryset, model, value):
+        if not value:
+            return queryset
+        if not self.request.user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(Exists(model.objects.filter(
+            user=self.request.user, recipe=OuterRef("pk"))))
+
+    def filter_is_favorited(self, queryset, name, value):
+        return self.filter_user_relation(queryset, Favorite, value)
+
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        if value:
-            return queryset.filter(shoppinglist__user=self.request.user)
-        return queryset
+        return self.filter_user_relation(queryset, ShoppingList, value)
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
@@ -0,0 +1,282 @@
+import json
+import os
+import random
+import time
+import tracemalloc
+from itertools import cycle
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import BaseCommand, call_command
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIClient
+
+from recipes.management.commands.add_data import DATA_DIR
+from recipes.models import (AmountIngredients, Favorite, Recipes, ShoppingList,
+                            Tags)
+from recipes.synthetic import Scale, generate
+from users.models import CustomUser, Follow
+
+# Отдельный кэш: --cold не должен очищать общий кэш сервиса
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark",
+    }
+}
+
+SCENARIOS = (
+    ("recipes_list", "/api/recipes/"),
+    ("recipes_list_page_20", "/api/recipes/?limit=20"),
+    ("recipes_tags", "/api/recipes/?tags={tag}&tags={other_tag}"),
+    ("recipes_favorited", "/api/recipes/?is_favorited=1"),
+    ("recipes_in_cart", "/api/recipes/?is_in_shopping_cart=1"),
+    ("recipes_search", "/api/recipes/?search=рецепт"),
+    ("recipe_detail", "/api/recipes/{recipe}/"),
+    ("recipe_similar", "/api/recipes/{recipe}/similar/"),
+    ("cookable", "/api/recipes/cookable/?{pantry}"),
+    ("subscriptions", "/api/users/subscriptions/?recipes_limit=3"),
+    ("feed", "/api/recipes/feed/"),
+    ("download_shopping_cart", "/api/recipes/download_shopping_cart/"),
+    ("shopping_list", "/api/recipes/shopping_list/"),
+    ("ingredient_search", "/api/ingredients/?name=мук"),
+)
+
+
+def percentile(values, share):
+    """Значение по ближайшему рангу"""
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, round(share * len(values)) - 1))
+    return values[index]
+
+
+class PhaseTimer:
+    """Время SQL-запросов и serializer.data за один запрос к API.
+
+    В время сериализации не входят выполненные внутри неё запросы, а
+    учитывается только внешний вызов data: вложенные сериализаторы
+    уже входят в его время.
+    """
+
+    def __init__(self):
+        self.sql = self.serialize = 0.0
+        self._depth = 0
+        self._patch = mock.patch.object(
+            BaseSerializer, "data", property(self._timed(BaseSerializer.data))
+        )
+
+    def _execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - started
+
+    def _timed(self, data):
+        def timed(serializer):
+            if self._depth:
+                return data.fget(serializer)
+            self._depth += 1
+            sql, started = self.sql, time.perf_counter()
+            try:
+                return data.fget(serializer)
+            finally:
+                self._depth -= 1
+                self.serialize += (
+                    time.perf_counter() - started - (self.sql - sql)
+                )
+        return timed
+
+    def __enter__(self):
+        self.sql = self.serialize = 0.0
+        self._wrapper = connection.execute_wrapper(self._execute)
+        self._wrapper.__enter__()
+        self._patch.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._patch.stop()
+        self._wrapper.__exit__(*exc_info)
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет p50/p99, время SQL и сериализации, число запросов и "
+        "память горячих эндпоинтов на синтетических данных во временной базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ingredients",
+            default=os.path.join(DATA_DIR, "ingredients.json"),
+            help="Файл ингредиентов для add_data"
+        )
+        parser.add_argument(
+            "--tags",
+            default=os.path.join(DATA_DIR, "tags.csv"),
+            help="Файл тегов для add_data"
+        )
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--recipes", type=int, default=500)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument("--follows", type=int, default=10)
+        parser.add_argument("--favorites", type=int, default=20)
+        parser.add_argument("--carts", type=int, default=20)
+        parser.add_argument(
+            "--repeat", type=int, default=30,
+            help="Сколько раз выполнить каждый сценарий"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--cold", action="store_true",
+            help="Очищать кэш перед каждым запросом"
+        )
+        parser.add_argument(
+            "--only", action="append",
+            help="Запустить только указанные сценарии"
+        )
+        parser.add_argument(
+            "--keepdb", action="store_true",
+            help="Не удалять тестовую базу после прогона"
+        )
+        parser.add_argument(
+            "--json", dest="json_path",
+            help="Сохранить результаты в JSON-файл"
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0, interactive=False, keepdb=options["keepdb"],
+            aliases={"default"},
+        )
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                results = self.run(options)
+        finally:
+            teardown_databases(
+                old_config, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+
+    def prepare(self, options):
+        call_command(
+            "add_data",
+            ingredients=options["ingredients"],
+            tags=options["tags"],
+            stdout=self.stdout,
+        )
+        scale = Scale(
+            options["users"], options["recipes"],
+            options["ingredients_per_recipe"], options["follows"],
+            options["favorites"], options["carts"],
+        )
+        started = time.perf_counter()
+        user_ids, recipe_ids = generate(scale, seed=options["seed"])
+        self.stdout.write(
+            f"Данные: {scale}, {time.perf_counter() - started:.1f} с"
+        )
+        return user_ids, recipe_ids
+
+    def run(self, options):
+        user_ids, recipe_ids = self.prepare(options)
+        rng = random.Random(options["seed"])
+        user = CustomUser.objects.filter(
+            pk__in=Follow.objects.values("user")
+        ).filter(
+            pk__in=Favorite.objects.values("user")
+        ).filter(
+            pk__in=ShoppingList.objects.values("user")
+        ).first() or CustomUser.objects.get(pk=user_ids[0])
+        client = APIClient()
+        client.force_authenticate(user)
+        tags = list(Tags.objects.values_list("slug", flat=True)[:2]) or [""]
+        recipes = cycle(rng.sample(recipe_ids, min(50, len(recipe_ids))))
+        pantry = AmountIngredients.objects.filter(
+            recipe_id=recipe_ids[0]
+        ).values_list("ingredients_id", flat=True) if recipe_ids else []
+        context = {
+            "tag": tags[0],
+            "other_tag": tags[-1],
+            "pantry": "&".join(
+                f"ingredients={pk}" for pk in list(pantry)[:5] or [1]
+            ),
+        }
+        self.stdout.write(
+            f"{'сценарий':<24}{'p50, мс':>10}{'p99, мс':>10}"
+            f"{'SQL, мс':>10}{'сериал., мс':>13}"
+            f"{'запросов':>10}{'пик, КиБ':>10}"
+        )
+        results = {"engine": connection.vendor, "scenarios": {}}
+        for name, url in SCENARIOS:
+            if options["only"] and name not in options["only"]:
+                continue
+            result = self.measure(
+                client, url, context, recipes, options["repeat"],
+                options["cold"]
+            )
+            results["scenarios"][name] = result
+            self.stdout.write(
+                f"{name:<24}{result['p50_ms']:>10.2f}"
+                f"{result['p99_ms']:>10.2f}{result['sql_ms']:>10.2f}"
+                f"{result['serialize_ms']:>13.2f}{result['queries']:>10}"
+                f"{result['peak_kib']:>10.0f}"
+            )
+        results["recipes"] = Recipes.objects.count()
+        return results
+
+    @staticmethod
+    def request(client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url}: {response.status_code}")
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+
+    def measure(self, client, url, context, recipes, repeat, cold):
+        """Прогрев, затем repeat замеров времени и один замер памяти.
+
+        Кроме полного времени ответа отдельно считаются время SQL и
+        время serializer.data без его собственных запросов.
+        """
+        urls = [
+            url.format(recipe=next(recipes), **context)
+            for _ in range(repeat + 1)
+        ]
+        self.request(client, urls[0])
+        timings, sql_timings, serialize_timings, queries = [], [], [], []
+        phases = PhaseTimer()
+        for current in urls[1:]:
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured, phases:
+                started = time.perf_counter()
+                self.request(client, current)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            sql_timings.append(phases.sql * 1000)
+            serialize_timings.append(phases.serialize * 1000)
+        if cold:
+            cache.clear()
+        tracemalloc.start()
+        try:
+            self.request(client, urls[-1])
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            "p50_ms": percentile(timings, 0.5),
+            "p99_ms": percentile(timings, 0.99),
+            "sql_ms": percentile(sql_timings, 0.5),
+            "serialize_ms": percentile(serialize_timings, 0.5),
+            "queries": max(queries),
+            "peak_kib": peak / 1024,
+        }
@@ -0,0 +1,132 @@
+import logging
+import re
+import threading
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_metrics = defaultdict(Counter)
+
+# (имя в Prometheus, тип, справка, ключ в агрегате)
+METRICS = (
+    ("api_requests_total", "counter",
+     "Число обработанных запросов", "requests"),
+    ("api_db_queries_total", "counter",
+     "Число SQL-запросов", "queries"),
+    ("api_db_queries_max", "gauge",
+     "Наибольшее число SQL-запросов за один запрос", "queries_max"),
+    ("api_db_seconds_total", "counter",
+     "Время выполнения SQL", "db_seconds"),
+    ("api_view_seconds_total", "counter",
+     "Время работы представления с сериализацией", "view_seconds"),
+    ("api_render_seconds_total", "counter",
+     "Время рендеринга ответа", "render_seconds"),
+    ("api_response_bytes_total", "counter",
+     "Размер тел ответов", "response_bytes"),
+    ("api_repeated_queries_total", "counter",
+     "Запросы с повторяющимся SQL (вероятный N+1)", "repeated_queries"),
+)
+
+IN_LIST = re.compile(r"\((?:%s, )+%s\)")
+
+
+def get_view_name(view_func, method):
+    """Класс и действие DRF (RecipesViewSet.list) или имя функции"""
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return getattr(view_func, "__name__", "unknown")
+    actions = getattr(view_func, "actions", None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f"{cls.__name__}.{action}"
+
+
+def sql_shape(sql):
+    """SQL без различий в длине списков IN"""
+    return IN_LIST.sub("(%s, ...)", sql)
+
+
+class QueryCollector:
+    """execute_wrapper: считает запросы, их время и формы SQL"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += perf_counter() - start
+            self.queries += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    @contextmanager
+    def collect(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def repeated(self):
+        if not self.shapes:
+            return None, 0
+        return self.shapes.most_common(1)[0]
+
+
+def record(view, collector, view_seconds, render_seconds, response_bytes):
+    shape, repeats = collector.repeated()
+    repeated = repeats >= settings.QUERY_METRICS_REPEAT_THRESHOLD
+    if repeated:
+        logger.warning(
+            "%s: SQL повторён %s раз: %s", view, repeats, shape[:300]
+        )
+    with _lock:
+        metrics = _metrics[view]
+        metrics["requests"] += 1
+        metrics["queries"] += collector.queries
+        metrics["queries_max"] = max(
+            metrics["queries_max"], collector.queries
+        )
+        metrics["db_seconds"] += collector.db_seconds
+        metrics["view_seconds"] += view_seconds
+        metrics["render_seconds"] += render_seconds
+        metrics["response_bytes"] += response_bytes
+        metrics["repeated_queries"] += repeated
+
+
+def snapshot():
+    with _lock:
+        return {view: dict(metrics) for view, metrics in _metrics.items()}
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+
+
+def escape_label(value):
+    return (
+        value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    )
+
+
+def render_prometheus(metrics=None):
+    """Агрегаты в текстовом формате Prometheus 0.0.4"""
+    if metrics is None:
+        metrics = snapshot()
+    lines = []
+    for name, kind, help_text, key in METRICS:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for view in sorted(metrics):
+            value = metrics[view].get(key, 0)
+            lines.append(f'{name}{{view="{escape_label(view)}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,63 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from api.metrics import QueryCollector, get_view_name, record
+
+
+class QueryMetricsMiddleware:
+    """Число и время SQL-запросов, время ответа и его размер по view.
+
+    Включается настройкой QUERY_METRICS_ENABLED. Если она выключена,
+    Django убирает middleware из цепочки при старте и запросы не
+    проходят через него вовсе.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        with collector.collect():
+            response = self.get_response(request)
+        view = getattr(request, "_metrics_view", None)
+        if view is None:
+            return response
+        finished = perf_counter()
+        view_end = getattr(request, "_metrics_view_end", finished)
+        view_seconds = view_end - request._metrics_view_start
+        render_seconds = finished - view_end
+        if not response.streaming:
+            record(view, collector, view_seconds, render_seconds,
+                   len(response.content))
+            return response
+        response.streaming_content = self.stream(
+            response.streaming_content, collector, view,
+            view_seconds + render_seconds
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = get_view_name(view_func, request.method)
+        request._metrics_view_start = perf_counter()
+
+    def process_template_response(self, request, response):
+        request._metrics_view_end = perf_counter()
+        return response
+
+    @staticmethod
+    def stream(content, collector, view, view_seconds):
+        """Потоковый ответ: запросы и байты учитываются по мере отдачи"""
+        size = 0
+        start = perf_counter()
+        try:
+            with collector.collect():
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            record(view, collector, view_seconds + perf_counter() - start,
+                   0, size)
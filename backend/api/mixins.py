@@ -0,0 +1,86 @@
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from recipes.catalog import get_catalog_version
+
+
+class CatalogCacheMixin:
+    """Условный GET и кэш готовых ответов справочника.
+
+    ETag и Last-Modified берутся из версии справочника, которая меняется
+    при любой записи в него, поэтому повторный запрос с If-None-Match
+    получает 304 без обращения к базе.
+    """
+    catalog = None
+
+    def cache_params(self, request):
+        """Параметры фильтров запроса: остальные на ответ не влияют.
+
+        Если строить ключ по полному URL, произвольные параметры
+        заводили бы в кэше сколько угодно копий одного ответа.
+        """
+        filterset_class = getattr(self, "filterset_class", None)
+        known = filterset_class.base_filters if filterset_class else {}
+        return sorted(
+            (name, value)
+            for name, values in request.query_params.lists() if name in known
+            for value in values
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        token, modified = get_catalog_version(self.catalog)
+        path_hash = md5(" ".join((
+            request.path,
+            urlencode(self.cache_params(request)),
+            request.accepted_renderer.format,
+        )).encode()).hexdigest()
+        etag = quote_etag(f"{self.catalog}-{token}-{path_hash[:12]}")
+        last_modified = int(modified)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self._cached_content(
+                f"catalog:{self.catalog}:{token}:{path_hash}",
+                handler, request, *args, **kwargs
+            )
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(
+                response, public=True, max_age=settings.CATALOG_CACHE_MAX_AGE
+            )
+            patch_vary_headers(response, ("Accept",))
+        return response
+
+    def _cached_content(self, key, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format != "json":
+            return handler(request, *args, **kwargs)
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(
+                content, content_type=request.accepted_media_type
+            )
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(
+                lambda rendered: cache.set(
+                    key, rendered.content, settings.CATALOG_CACHE_TIMEOUT
+                )
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,11 @@
+from rest_framework.negotiation import BaseContentNegotiation
+
+
+class IgnoreFormatContentNegotiation(BaseContentNegotiation):
+    """Не трактует ?format= как выбор рендерера DRF"""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
@@ -1,6 +1,100 @@
+import binascii
+from base64 import b64decode, b64encode
+
+from django.utils.dateparse import parse_datetime
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPagination(pagination.PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class RecipesCursorPagination(pagination.CursorPagination):
+    """Keyset-пагинация ленты рецептов без COUNT(*) и OFFSET"""
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = ('-published', '-id')
+
+
+class SubscriptionsCursorPagination(RecipesCursorPagination):
+    ordering = ('-id',)
+
+
+class OptionalCursorPaginationMixin:
+    """Переключает вью на cursor-пагинацию по ?pagination=cursor"""
+    cursor_pagination_class = None
+    pagination_query_param = 'pagination'
+
+    def use_cursor_pagination(self):
+        params = self.request.query_params
+        return self.cursor_pagination_class is not None and (
+            params.get(self.pagination_query_param) == 'cursor'
+            or self.cursor_pagination_class.cursor_query_param in params
+        )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.use_cursor_pagination():
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
+
+class FeedPagination(pagination.BasePagination):
+    """Keyset-пагинация ленты по (published, id) последнего рецепта"""
+    page_size = 6
+    max_page_size = 50
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            published, pk = b64decode(
+                encoded.encode(), altchars=b'-_'
+            ).decode().rsplit('|', 1)
+            published, pk = parse_datetime(published), int(pk)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if published is None:
+            raise NotFound(self.invalid_cursor_message)
+        return published, pk
+
+    def encode_cursor(self, entry):
+        published, pk = entry
+        encoded = b64encode(
+            f'{published.isoformat()}|{pk}'.encode(), altchars=b'-_'
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param, encoded
+        )
+
+    def paginate_entries(self, entries, request):
+        """entries берутся на один больше страницы, чтобы узнать о next"""
+        self.request = request
+        size = self.get_page_size(request)
+        self.next_entry = entries[size - 1] if len(entries) > size else None
+        return entries[:size]
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_entry and self.encode_cursor(self.next_entry),
+            'results': data,
+        })
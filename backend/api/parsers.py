@@ -0,0 +1,28 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class MultipartJsonParser(MultiPartParser):
+    """multipart/form-data, где поля рецепта лежат JSON-ом в части data.
+
+    Файлы сохраняются обработчиками загрузки Django (крупные - во
+    временный файл на диске), а не попадают в память целиком.
+    """
+    json_field = "data"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parsed = super().parse(stream, media_type, parser_context)
+        if self.json_field not in parsed.data:
+            return parsed
+        try:
+            data = json.loads(parsed.data[self.json_field])
+        except ValueError as error:
+            raise ParseError(f"Некорректный JSON в поле {self.json_field}: "
+                             f"{error}")
+        if not isinstance(data, dict):
+            raise ParseError(f"Поле {self.json_field} должно быть объектом")
+        # DRF объединяет data и files через dict.update: MultiValueDict
+        # отдал бы списки вместо файлов
+        return DataAndFiles(data, parsed.files.dict())
@@ -1,10 +1,21 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Manager, Prefetch, prefetch_related_objects
 from django.utils import timezone
-from drf_extra_fields.fields import Base64ImageField
+from drf_extra_fields.fields import HybridImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from recipes.models import (AmountIngredients, Favorite, Ingredients, Recipes,
-                            ShoppingList, Tags, TagsRecipes)
+from recipes.cookable import record_recipe_changes
+from recipes.fragments import get_fragments
+from recipes.images import check_image, rendition_urls, schedule_renditions
+from recipes.models import (AmountIngredients, Ingredients, Recipes,
+                            ShoppingListItem, Tags, TagsRecipes)
+from recipes.relations import (FAVORITES, FOLLOWING, SHOPPING_CART,
+                               get_user_relations)
+from recipes.returning import delete_returning
+from recipes.search import refresh_search_documents
+from recipes.shopping import change_recipe_amounts
 from users.serializers import CurrentUserSerializer
 
 
@@ -37,9 +48,41 @@ class AllIngredientsSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit", "amount")
 
 
+class BatchIdsSerializer(serializers.Serializer):
+    """Список id рецептов или авторов для пакетной операции"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_RELATIONS_LIMIT,
+    )
+
+
+class CookableQuerySerializer(serializers.Serializer):
+    """Параметры подбора рецептов по имеющимся ингредиентам"""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+    max_missing = serializers.IntegerField(
+        min_value=0, max_value=20, required=False
+    )
+
+
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Сериализатор строки сводного списка покупок"""
+    id = serializers.ReadOnlyField(source="ingredients.id")
+    name = serializers.ReadOnlyField(source="ingredients.name")
+    measurement_unit = serializers.ReadOnlyField(
+        source="ingredients.measurement_unit"
+    )
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ("id", "name", "measurement_unit", "amount")
+
+
 class AmountRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор ингредиенты для создания рецепта"""
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredients.objects.all())
+    id = serializers.IntegerField()
 
     class Meta:
         model = AmountIngredients
@@ -54,14 +97,62 @@ class SupportRecipesSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "image", "cooking_time")
 
 
-class GetRecipesSerializer(serializers.ModelSerializer):
-    """GET Сериализатор Рецептов"""
+class RecipeAuthorSerializer(CurrentUserSerializer):
+    """Автор рецепта без признака подписки"""
+
+    class Meta(CurrentUserSerializer.Meta):
+        fields = ("id", "email", "username", "first_name", "last_name")
+
+
+class RecipeFragmentSerializer(serializers.ModelSerializer):
+    """Не зависящая от пользователя часть представления рецепта"""
     tags = TagsSerializer(many=True)
-    author = CurrentUserSerializer()
+    author = RecipeAuthorSerializer()
     ingredients = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipes
+        fields = (
+            "id",
+            "tags",
+            "author",
+            "ingredients",
+            "name",
+            "image",
+            "images",
+            "text",
+            "cooking_time",
+            "published"
+        )
+
+    @staticmethod
+    def get_ingredients(obj):
+        queryset = obj.ingredients_list.all()
+        return AllIngredientsSerializer(queryset, many=True).data
+
+    @staticmethod
+    def get_images(obj):
+        return rendition_urls(obj)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Список рецептов: фрагменты всей страницы читаются из кэша разом"""
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        self.child.fragments = get_fragments(
+            recipes, self.child.build_fragments)
+        return super().to_representation(recipes)
+
+
+class GetRecipesSerializer(RecipeFragmentSerializer):
+    """GET Сериализатор Рецептов"""
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
+    fragments = None
+
     class Meta:
         model = Recipes
         fields = (
@@ -73,6 +164,7 @@ class GetRecipesSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "images",
             "text",
             "cooking_time",
             "published"
@@ -80,25 +172,59 @@ class GetRecipesSerializer(serializers.ModelSerializer):
         ordering = ("-published",)
         read_only_fields = (
             "author", "ingredients", "is_favorited", "is_in_shopping_cart",)
+        list_serializer_class = RecipeListSerializer
 
     @staticmethod
-    def get_ingredients(obj):
-        queryset = AmountIngredients.objects.filter(recipe=obj)
-        return AllIngredientsSerializer(queryset, many=True).data
+    def build_fragments(recipes):
+        prefetch_related_objects(
+            recipes,
+            "author",
+            "tags",
+            Prefetch(
+                "ingredients_list",
+                queryset=AmountIngredients.objects.select_related(
+                    "ingredients")
+            ),
+        )
+        return {
+            recipe.id: RecipeFragmentSerializer(recipe).data
+            for recipe in recipes
+        }
 
-    def __checked_queryset(self, obj, model):
+    def to_representation(self, instance):
+        if self.fragments is None or instance.id not in self.fragments:
+            self.fragments = get_fragments([instance], self.build_fragments)
+        fragment = self.fragments[instance.id]
         request = self.context.get('request')
-        if request.user.is_anonymous:
-            return False
-        queryset = model.objects.filter(
-            user=request.user.id, recipe=obj.id).exists()
-        return queryset
+        representation = dict(
+            fragment,
+            author=dict(
+                fragment["author"],
+                is_subscribed=self.__checked_relation(
+                    instance.author_id, FOLLOWING)
+            ),
+            image=self.__absolute_url(request, fragment["image"]),
+            images={
+                name: self.__absolute_url(request, url)
+                for name, url in fragment["images"].items()
+            },
+            is_favorited=self.__checked_relation(instance.id, FAVORITES),
+            is_in_shopping_cart=self.__checked_relation(
+                instance.id, SHOPPING_CART),
+        )
+        return {name: representation[name] for name in self.Meta.fields}
 
-    def get_is_favorited(self, obj):
-        return self.__checked_queryset(obj=obj, model=Favorite)
+    @staticmethod
+    def __absolute_url(request, url):
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
 
-    def get_is_in_shopping_cart(self, obj):
-        return self.__checked_queryset(obj=obj, model=ShoppingList)
+    def __checked_relation(self, pk, kind):
+        request = self.context.get('request')
+        if request is None or request.user.is_anonymous:
+            return False
+        return get_user_relations(request).contains(kind, pk)
 
 
 class CreateRecipesSerializer(serializers.ModelSerializer):
@@ -109,7 +235,7 @@ class CreateRecipesSerializer(serializers.ModelSerializer):
         queryset=Tags.objects.all(),
         many=True
     )
-    image = Base64ImageField()
+    image = HybridImageField()
     published = serializers.HiddenField(default=timezone.now)
 
     class Meta:
@@ -126,6 +252,10 @@ class CreateRecipesSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("author",)
 
+    def validate_image(self, image):
+        check_image(image)
+        return image
+
     def validate(self, data):
         ingredients_d = data['ingredients']
         ingredients_set = set()
@@ -139,6 +269,12 @@ class CreateRecipesSerializer(serializers.ModelSerializer):
                     'Ингредиент в рецепте не должен повторяться.'
                 )
             ingredients_set.add(ingredient['id'])
+        missing = ingredients_set - set(Ingredients.objects.filter(
+            id__in=ingredients_set).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {sorted(missing)}'
+            )
         tags_d = data["tags"]
         tags_set = set()
         for tag in tags_d:
@@ -154,32 +290,99 @@ class CreateRecipesSerializer(serializers.ModelSerializer):
         return data
 
     @staticmethod
-    def add_ingredients_tags(ingredients, recipe, tags):
-        for ingredient in ingredients:
-            AmountIngredients.objects.update_or_create(
-                recipe=recipe,
-                ingredients=ingredient["id"],
-                amount=ingredient["amount"]
+    def set_ingredients(recipe, ingredients, created=False):
+        """Приводит ингредиенты рецепта к переданному набору одним диффом"""
+        amounts = {
+            ingredient["id"]: ingredient["amount"]
+            for ingredient in ingredients
+        }
+        current = {}
+        if not created:
+            current = {
+                item.ingredients_id: item
+                for item in AmountIngredients.objects.filter(recipe=recipe)
+            }
+        removed = current.keys() - amounts.keys()
+        deltas = {
+            ingredient_id: -current[ingredient_id].amount
+            for ingredient_id in removed
+        }
+        if removed:
+            # Без сигналов post_delete: списки покупок правятся ниже
+            # одним вызовом, а кэш и индекс обновляет сохранение рецепта
+            delete_returning(AmountIngredients.objects.filter(
+                recipe=recipe, ingredients_id__in=removed), "ingredients")
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                deltas[ingredient_id] = amount - item.amount
+                item.amount = amount
+                changed.append(item)
+        AmountIngredients.objects.bulk_update(changed, ("amount",))
+        AmountIngredients.objects.bulk_create([
+            AmountIngredients(
+                recipe=recipe, ingredients_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ])
+        if not created:
+            deltas.update(
+                (ingredient_id, amount)
+                for ingredient_id, amount in amounts.items()
+                if ingredient_id not in current
             )
-        for tag in tags:
-            recipe.tags.add(tag)
+            change_recipe_amounts(recipe.pk, deltas)
+
+    @staticmethod
+    def set_tags(recipe, tags, created=False):
+        """Приводит теги рецепта к переданному набору одним диффом"""
+        tag_ids = {tag.id for tag in tags}
+        current = set()
+        if not created:
+            current = set(TagsRecipes.objects.filter(
+                recipe=recipe).values_list("tag_id", flat=True))
+        removed = current - tag_ids
+        if removed:
+            TagsRecipes.objects.filter(
+                recipe=recipe, tag_id__in=removed).delete()
+        TagsRecipes.objects.bulk_create([
+            TagsRecipes(recipe=recipe, tag_id=tag_id)
+            for tag_id in tag_ids - current
+        ])
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
         recipe = Recipes.objects.create(**validated_data)
-        self.add_ingredients_tags(ingredients, recipe, tags)
+        self.set_ingredients(recipe, ingredients, created=True)
+        self.set_tags(recipe, tags, created=True)
+        refresh_search_documents([recipe.pk])
+        record_recipe_changes([recipe.pk])
+        schedule_renditions(recipe.pk)
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
-        AmountIngredients.objects.filter(recipe=recipe).delete()
-        TagsRecipes.objects.filter(recipe=recipe).delete()
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
-        self.add_ingredients_tags(ingredients, recipe, tags)
-        return super().update(recipe, validated_data)
+        if "image" in validated_data:
+            validated_data["renditions"] = {}
+            schedule_renditions(recipe.pk)
+        recipe = super().update(recipe, validated_data)
+        self.set_ingredients(recipe, ingredients)
+        self.set_tags(recipe, tags)
+        refresh_search_documents([recipe.pk])
+        record_recipe_changes([recipe.pk])
+        return recipe
 
     def to_representation(self, instance):
         request = self.context.get("request")
         context = {"request": request}
-        return GetRecipesSerializer(instance, context=context).data
+        # Версии картинки могли записаться после сохранения: UPDATE из
+        # generate_renditions не меняет объект в памяти
+        instance.refresh_from_db(fields=["renditions"])
+        serializer = GetRecipesSerializer(instance, context=context)
+        serializer.fragments = serializer.build_fragments([instance])
+        return serializer.data
@@ -1,8 +1,9 @@
 from django.urls import include, path, re_path
 from rest_framework.routers import SimpleRouter
 
-from api.views import (IngredientsViewSet, MainSubscribeViewSet,
-                       RecipesViewSet, SubscribeListView, TagsViewSet)
+from api.views import (BatchSubscribeView, IngredientsViewSet,
+                       MainSubscribeViewSet, MetricsView, RecipesViewSet,
+                       SubscribeListView, TagsViewSet)
 
 router = SimpleRouter()
 router.register("tags", TagsViewSet, basename="tags")
@@ -15,11 +16,17 @@ urlpatterns = [
         SubscribeListView.as_view(),
         name="subscriptions"
     ),
+    path(
+        "users/subscribe/batch/",
+        BatchSubscribeView.as_view(),
+        name="subscribe-batch"
+    ),
     path(
         "users/<int:user_id>/subscribe/",
         MainSubscribeViewSet.as_view(),
         name="subscribe"
     ),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
     path("", include(router.urls)),
     path("", include("djoser.urls")),
     re_path(r"^auth/", include("djoser.urls.authtoken")),
@@ -1,53 +1,94 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from hashlib import md5
+
+from django.conf import settings
+from django.db.models import Count, Max, OuterRef, Prefetch, Subquery, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import FormParser, JSONParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from api.exporters import get_exporter
 from api.filters import IngredientFilter, RecipeFilter
-from api.paginations import CustomPagination
+from api.metrics import render_prometheus
+from api.mixins import CatalogCacheMixin
+from api.negotiations import IgnoreFormatContentNegotiation
+from api.paginations import (CustomPagination, FeedPagination,
+                             OptionalCursorPaginationMixin,
+                             RecipesCursorPagination,
+                             SubscriptionsCursorPagination)
+from api.parsers import MultipartJsonParser
 from api.permissions import IsUserSuperuserOrReadOnly
-from api.serializers import (CreateRecipesSerializer, GetRecipesSerializer,
-                             IngredientsSerializer, SupportRecipesSerializer,
-                             TagsSerializer)
-from recipes.models import (AmountIngredients, Favorite, Ingredients, Recipes,
-                            ShoppingList, Tags)
+from api.serializers import (BatchIdsSerializer, CookableQuerySerializer,
+                             CreateRecipesSerializer, GetRecipesSerializer,
+                             IngredientsSerializer, ShoppingListItemSerializer,
+                             SupportRecipesSerializer, TagsSerializer)
+from recipes.autocomplete import ingredient_index
+from recipes.batch import add_relation, change_relations, remove_relation
+from recipes.catalog import INGREDIENTS, TAGS, get_catalog_version
+from recipes.cookable import cookable_index
+from recipes.feed import get_feed
+from recipes.models import (Ingredients, Recipes, ShoppingList,
+                            ShoppingListItem, Tags)
+from recipes.relations import (FAVORITES, FOLLOWING, SHOPPING_CART,
+                               get_user_relations)
+from recipes.similar import get_similar
+from recipes.units import merge_units
 from users.models import CustomUser, Follow
-from users.serializers import SubscribeListSerializer, SubscribeSerializer
+from users.serializers import (SubscribeListSerializer, SubscribeSerializer,
+                               get_recipes_limit)
 
 
-class TagsViewSet(ListModelMixin, RetrieveModelMixin, viewsets.GenericViewSet):
+class TagsViewSet(CatalogCacheMixin, ListModelMixin, RetrieveModelMixin,
+                  viewsets.GenericViewSet):
     """Получение Тега"""
+    catalog = TAGS
     queryset = Tags.objects.all()
     serializer_class = TagsSerializer
     permission_classes = (IsUserSuperuserOrReadOnly,)
     pagination_class = None
 
 
-class IngredientsViewSet(ListModelMixin, RetrieveModelMixin,
-                         viewsets.GenericViewSet):
+class IngredientsViewSet(CatalogCacheMixin, ListModelMixin,
+                         RetrieveModelMixin, viewsets.GenericViewSet):
     """Получение Ингредиентов"""
+    catalog = INGREDIENTS
     queryset = Ingredients.objects.all()
     serializer_class = IngredientsSerializer
     permission_classes = (IsUserSuperuserOrReadOnly,)
     pagination_class = None
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(self.autocomplete, request, name)
+
+    def autocomplete(self, request, name):
+        return Response(ingredient_index.search(name))
 
-class RecipesViewSet(viewsets.ModelViewSet):
+
+class RecipesViewSet(OptionalCursorPaginationMixin, viewsets.ModelViewSet):
     """Получение Рецептов"""
-    queryset = Recipes.objects.all()
     permission_classes = (IsUserSuperuserOrReadOnly,)
     http_method_names = ["get", "post", "patch", "delete"]
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     pagination_class = CustomPagination
+    cursor_pagination_class = RecipesCursorPagination
+    parser_classes = (JSONParser, MultipartJsonParser, FormParser)
+
+    def get_queryset(self):
+        return Recipes.objects.all()
 
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -75,65 +116,240 @@ class RecipesViewSet(viewsets.ModelViewSet):
             headers=headers
         )
 
-    def __base(self, request, ch_model, pk=None):
+    def __base(self, request, kind, pk=None):
+        """Ответ по числу строк из INSERT/DELETE: двойной клик не даёт 500"""
         user = request.user
-        recipe = get_object_or_404(Recipes, pk=pk)
         if request.method == "POST":
-            relation = ch_model.objects.filter(user=user, recipe=recipe)
-            if relation.exists():
+            recipe = get_object_or_404(Recipes, pk=pk)
+            if not add_relation(kind, user.id, recipe.pk):
                 return Response(
                     "Объект уже есть в списке!",
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            ch_model.objects.create(user=user, recipe=recipe)
             serializer = SupportRecipesSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         if request.method == "DELETE":
-            relation = ch_model.objects.filter(user=user, recipe=recipe)
-            if not relation.exists():
-                return Response(
-                    "Объекта нет в списке!",
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            relation.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+            if remove_relation(kind, user.id, pk):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(Recipes.objects.only("pk"), pk=pk)
+            return Response(
+                "Объекта нет в списке!",
+                status=status.HTTP_400_BAD_REQUEST
+            )
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
     @action(detail=True, methods=["post", "delete"], url_path="favorite")
     def favorite(self, request, pk=None):
         """Удаление и добавление рецептов в Избранное"""
-        return self.__base(request, ch_model=Favorite, pk=pk)
+        return self.__base(request, kind=FAVORITES, pk=pk)
 
     @action(detail=True, methods=["post", "delete"], url_path="shopping_cart")
     def shopping_cart(self, request, pk=None):
         """Удаление и добавление рецептов в Покупки"""
-        return self.__base(request, ch_model=ShoppingList, pk=pk)
+        return self.__base(request, kind=SHOPPING_CART, pk=pk)
+
+    def __batch(self, request, kind):
+        serializer = BatchIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+        found = set(
+            Recipes.objects.filter(pk__in=ids).values_list("pk", flat=True)
+        )
+        return Response({"results": change_relations(
+            kind, request.user.id, ids, found, request.method == "POST"
+        )})
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="favorite/batch",
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_batch(self, request):
+        """Добавление и удаление пачки рецептов в Избранном"""
+        return self.__batch(request, FAVORITES)
+
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="shopping_cart/batch",
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_batch(self, request):
+        """Добавление и удаление пачки рецептов в Покупках"""
+        return self.__batch(request, SHOPPING_CART)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="feed",
+        permission_classes=(IsAuthenticated,),
+    )
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь"""
+        paginator = FeedPagination()
+        entries = paginator.paginate_entries(get_feed(
+            request.user.id,
+            get_user_relations(request).get(FOLLOWING),
+            paginator.get_page_size(request) + 1,
+            paginator.decode_cursor(request),
+        ), request)
+        recipes = Recipes.objects.in_bulk(
+            [recipe_id for _, recipe_id in entries]
+        )
+        serializer = GetRecipesSerializer(
+            [recipes[recipe_id] for _, recipe_id in entries
+             if recipe_id in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="similar",
+        pagination_class=None,
+    )
+    def similar(self, request, pk=None):
+        """Рецепты, которые добавляют те же пользователи"""
+        limit = settings.SIMILAR_RECIPES_LIMIT
+        try:
+            limit = min(int(request.query_params["limit"]), limit)
+        except (KeyError, ValueError):
+            pass
+        similar_ids = get_similar(self.get_object().pk, max(limit, 0))
+        recipes = Recipes.objects.in_bulk(similar_ids)
+        serializer = GetRecipesSerializer(
+            [recipes[recipe_id] for recipe_id in similar_ids
+             if recipe_id in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
+
+    @action(detail=False, methods=["get"], url_path="cookable")
+    def cookable(self, request):
+        """Рецепты из имеющихся ингредиентов: сначала где меньше недостаёт"""
+        params = request.query_params.dict()
+        params["ingredients"] = request.query_params.getlist("ingredients")
+        query = CookableQuerySerializer(data=params)
+        query.is_valid(raise_exception=True)
+        paginator = CustomPagination()
+        page = paginator.paginate_queryset(cookable_index.match(
+            query.validated_data["ingredients"],
+            query.validated_data.get("max_missing"),
+        ), request, view=self)
+        recipes = Recipes.objects.in_bulk(
+            [recipe_id for recipe_id, _ in page]
+        )
+        found = [
+            (recipes[recipe_id], missing) for recipe_id, missing in page
+            if recipe_id in recipes
+        ]
+        serializer = GetRecipesSerializer(
+            [recipe for recipe, _ in found],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        for data, (_, missing) in zip(serializer.data, found):
+            data["missing_ingredients"] = missing
+        return paginator.get_paginated_response(serializer.data)
 
-    @action(detail=False, methods=["get"], url_path="download_shopping_cart")
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="shopping_list",
+        permission_classes=(IsAuthenticated,),
+        pagination_class=None,
+    )
+    def shopping_list(self, request):
+        """Сводный список покупок из рецептов в корзине"""
+        items = ShoppingListItem.objects.filter(
+            user=request.user
+        ).select_related("ingredients").order_by("ingredients__name")
+        serializer = ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="download_shopping_cart",
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=IgnoreFormatContentNegotiation,
+    )
     def download_shopping_cart(self, request):
-        ingredients = AmountIngredients.objects.filter(
-            recipe__shoppinglist__user=request.user).values(
+        exporter = get_exporter(request.query_params.get("format"))
+        state = ShoppingList.objects.filter(user=request.user).aggregate(
+            count=Count("id"),
+            last_id=Max("id"),
+            added=Max("added"),
+            updated=Max("recipe__updated"),
+        )
+        # Названия и единицы берутся из справочника: его правка тоже
+        # меняет файл, хотя корзина та же
+        catalog_token, catalog_modified = get_catalog_version(INGREDIENTS)
+        last_modified = max(
+            filter(None, (state["added"], state["updated"])),
+            default=None
+        )
+        etag = quote_etag(md5(
+            f'{exporter.format}:{state["count"]}:{state["last_id"]}:'
+            f'{last_modified}:{catalog_token}'.encode()
+        ).hexdigest())
+        timestamp = max(
+            int(last_modified.timestamp()) if last_modified else 0,
+            int(catalog_modified),
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is not None:
+            return self.__private(response)
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user).values(
             'ingredients__name', 'ingredients__measurement_unit').annotate(
-            amount=Sum('amount'))
-        shopping_cart = '\n'.join([
-            f'{i["ingredients__name"]} '
-            f'({i["ingredients__measurement_unit"]}) – '
-            f'{i["amount"]}'
-            for i in ingredients
-        ])
-        response = HttpResponse(shopping_cart, content_type='text/plain')
+            amount=Sum('amount')).order_by()
+        response = StreamingHttpResponse(
+            exporter.stream(merge_units(ingredients.iterator())),
+            content_type=exporter.content_type
+        )
         response['Content-Disposition'] = (
-            'attachment; filename=shopping_cart.txt')
+            f'attachment; filename={exporter.filename}')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(timestamp)
+        return self.__private(response)
+
+    @staticmethod
+    def __private(response):
+        """Список покупок свой у каждого: общим кэшам его хранить нельзя"""
+        # no-cache: браузер сверяет ETag при каждом скачивании
+        patch_cache_control(response, private=True, no_cache=True)
         return response
 
 
-class SubscribeListView(ListAPIView):
-    """Список покупок"""
+class SubscribeListView(OptionalCursorPaginationMixin, ListAPIView):
+    """Список подписок"""
     serializer_class = SubscribeListSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = CustomPagination
+    cursor_pagination_class = SubscriptionsCursorPagination
 
     def get_queryset(self):
-        return Follow.objects.filter(user=self.request.user)
+        recipes = Recipes.objects.order_by("-published", "-id")
+        limit = get_recipes_limit(self.request)
+        if limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipes.objects.filter(author=OuterRef("author"))
+                .order_by("-published", "-id")
+                .values("pk")[:limit]
+            ))
+        return Follow.objects.filter(
+            user=self.request.user
+        ).select_related("author").prefetch_related(
+            Prefetch("author__recipes", queryset=recipes,
+                     to_attr="latest_recipes")
+        ).order_by("-id")
 
 
 class MainSubscribeViewSet(APIView):
@@ -149,19 +365,12 @@ class MainSubscribeViewSet(APIView):
                 {'error': 'Нельзя подписаться на себя'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        if Follow.objects.filter(
-                user=request.user,
-                author_id=user_id
-        ).exists():
+        author = get_object_or_404(CustomUser, id=user_id)
+        if not add_relation(FOLLOWING, request.user.id, author.pk):
             return Response(
                 {'error': 'Вы уже подписаны на пользователя'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        author = get_object_or_404(CustomUser, id=user_id)
-        Follow.objects.create(
-            user=request.user,
-            author_id=user_id
-        )
         return Response(
             self.serializer_class(author, context={'request': request}).data,
             status=status.HTTP_201_CREATED
@@ -169,15 +378,46 @@ class MainSubscribeViewSet(APIView):
 
     def delete(self, request, *args, **kwargs):
         user_id = self.kwargs.get('user_id')
-        get_object_or_404(CustomUser, id=user_id)
-        subscription = Follow.objects.filter(
-            user=request.user,
-            author_id=user_id
-        )
-        if subscription:
-            subscription.delete()
+        if remove_relation(FOLLOWING, request.user.id, user_id):
             return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(CustomUser.objects.only('pk'), id=user_id)
         return Response(
             {'error': 'Вы не подписаны на пользователя'},
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class BatchSubscribeView(APIView):
+    """Подписаться/отписаться на пачку авторов"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        return self.change(request, add=True)
+
+    def delete(self, request, *args, **kwargs):
+        return self.change(request, add=False)
+
+    def change(self, request, add):
+        serializer = BatchIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        found = set(CustomUser.objects.filter(pk__in=ids).exclude(
+            pk=request.user.id
+        ).values_list('pk', flat=True))
+        return Response({'results': change_relations(
+            FOLLOWING, request.user.id, ids, found, add
+        )})
+
+
+class MetricsView(APIView):
+    """Метрики запросов к API в формате Prometheus"""
+    permission_classes = (IsAdminUser,)
+    content_negotiation_class = IgnoreFormatContentNegotiation
+
+    def get(self, request):
+        if not settings.QUERY_METRICS_ENABLED:
+            raise Http404
+        return HttpResponse(
+            render_prometheus(),
+            content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
@@ -39,6 +39,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.QueryMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -72,6 +73,11 @@ DATABASES = {
         "PORT": os.getenv("DB_PORT", default="5432"),
     }
 }
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # Тестовая база в файле: тесты гонок ходят в неё из нескольких потоков
+    DATABASES["default"]["TEST"] = {
+        "NAME": os.path.join(BASE_DIR, "test_db.sqlite3"),
+    }
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -110,10 +116,76 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2 * 1024 * 1024
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", default=""),
+    }
+}
+
+RELATIONS_CACHE_TIMEOUT = 60 * 60
+
+QUERY_METRICS_ENABLED = os.getenv(
+    "QUERY_METRICS_ENABLED", default="False"
+).lower() in ("1", "true", "yes")
+QUERY_METRICS_REPEAT_THRESHOLD = int(
+    os.getenv("QUERY_METRICS_REPEAT_THRESHOLD", default=10)
+)
+
+CATALOG_CACHE_TIMEOUT = 24 * 60 * 60
+CATALOG_CACHE_MAX_AGE = 5 * 60
+
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", default=10000))
+FEED_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 100
+FEED_PULL_AUTHORS_TIMEOUT = 5 * 60
+
+SIMILAR_RECIPES_LIMIT = 20
+SIMILAR_RECIPES_MIN_COMMON = int(
+    os.getenv("SIMILAR_RECIPES_MIN_COMMON", default=2)
+)
+SIMILAR_RECIPES_MAX_USERS = 1000
+SIMILAR_RECIPES_BATCH_SIZE = 100
+
+BATCH_RELATIONS_LIMIT = 100
+
+COOKABLE_MAX_MISSING = 2
+COOKABLE_MAX_CHANGES = 1000
+COOKABLE_CHANGES_TIMEOUT = 24 * 60 * 60
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = int(
+    os.getenv("INGREDIENT_AUTOCOMPLETE_LIMIT", default=20)
+)
+
+BACKGROUND_EXECUTOR = os.getenv("BACKGROUND_EXECUTOR", default="thread")
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", default=2))
+
+RECIPE_IMAGE_FORMAT = os.getenv("RECIPE_IMAGE_FORMAT", default="WEBP")
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 40_000_000
+RECIPE_IMAGE_RENDITIONS = {
+    "thumbnail": ("160x160", {"crop": "center"}),
+    "card": ("600x400", {"crop": "center"}),
+    "detail": ("1200x1200", {"upscale": False}),
+}
+
+PDF_FONT_PATH = os.getenv(
+    "PDF_FONT_PATH",
+    default="/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
@@ -1,7 +1,8 @@
 from django.contrib import admin
 
 from recipes.models import (AmountIngredients, Favorite, Ingredients, Recipes,
-                            ShoppingList, Tags)
+                            ShoppingList, ShoppingListItem, Tags)
+from recipes.search import refresh_search_documents
 
 
 @admin.register(Tags)
@@ -42,8 +43,12 @@ class RecipesAdmin(admin.ModelAdmin):
     inlines = (AmountIngredientsInline,)
     empty_value_display = "-пусто-"
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_search_documents([form.instance.pk])
+
     def is_favorite(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
 
 @admin.register(Favorite)
@@ -60,3 +65,17 @@ class ShoppingListAdmin(admin.ModelAdmin):
     list_filter = ("user",)
     search_fields = ("user",)
     empty_value_display = "-пусто-"
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "ingredients", "amount")
+    list_filter = ("user",)
+    list_select_related = ("user", "ingredients")
+    empty_value_display = "-пусто-"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
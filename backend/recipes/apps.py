@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class RecipesConfig(AppConfig):
     name = 'recipes'
+
+    def ready(self):
+        import recipes.signals  # noqa: F401
+        from recipes.search import create_search_indexes
+        post_migrate.connect(create_search_indexes, sender=self)
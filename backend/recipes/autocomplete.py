@@ -0,0 +1,92 @@
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from operator import itemgetter
+
+from django.conf import settings
+
+from recipes.catalog import INGREDIENTS, get_catalog_version
+from recipes.models import Ingredients
+
+SEPARATOR = "\n"
+
+Snapshot = namedtuple(
+    "Snapshot", ("version", "keys", "rows", "offsets", "haystack")
+)
+
+
+def normalize(value):
+    return " ".join(value.casefold().replace("ё", "е").split())
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для подсказок по названию.
+
+    Названия хранятся отсортированными: префикс ищется бинарным поиском,
+    подстрока - через str.find по склеенной строке всех названий.
+    Индекс пересобирается при смене версии справочника ингредиентов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    @staticmethod
+    def _build(version):
+        entries = sorted((
+            (normalize(name), {
+                "id": pk, "name": name, "measurement_unit": unit
+            })
+            for pk, name, unit in Ingredients.objects.values_list(
+                "id", "name", "measurement_unit"
+            ).iterator()
+        ), key=itemgetter(0))
+        keys = [key for key, _ in entries]
+        offsets, position = [], 0
+        for key in keys:
+            offsets.append(position)
+            position += len(key) + len(SEPARATOR)
+        return Snapshot(
+            version=version,
+            keys=keys,
+            rows=[row for _, row in entries],
+            offsets=offsets,
+            haystack=SEPARATOR.join(keys),
+        )
+
+    def _load(self):
+        version, _ = get_catalog_version(INGREDIENTS)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._snapshot = self._build(version)
+        return snapshot
+
+    def search(self, query, limit=None):
+        """Сначала совпадения по префиксу, затем по подстроке"""
+        if limit is None:
+            limit = settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+        query = normalize(query)
+        index = self._load()
+        if not query:
+            return index.rows[:limit]
+        start = bisect_left(index.keys, query)
+        end = bisect_right(index.keys, query + "\uffff", lo=start)
+        result = index.rows[start:min(end, start + limit)]
+        position = index.haystack.find(query)
+        while position != -1 and len(result) < limit:
+            number = bisect_right(index.offsets, position) - 1
+            if not start <= number < end:
+                result.append(index.rows[number])
+            if number + 1 == len(index.offsets):
+                break
+            position = index.haystack.find(
+                query, index.offsets[number + 1]
+            )
+        return result
+
+
+ingredient_index = IngredientIndex()
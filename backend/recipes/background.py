@@ -0,0 +1,43 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix="background",
+        )
+    return _executor
+
+
+def _run_in_thread(task, *args):
+    try:
+        task(*args)
+    except Exception:
+        logger.exception("Фоновая задача %s%r не выполнена",
+                         task.__name__, args)
+    finally:
+        connections.close_all()
+
+
+def run_after_commit(task, *args):
+    """Запускает задачу после фиксации транзакции, не задерживая ответ.
+
+    С BACKGROUND_EXECUTOR = "sync" задача выполняется сразу в том же
+    потоке: так её результат видят тесты.
+    """
+    if settings.BACKGROUND_EXECUTOR == "sync":
+        transaction.on_commit(lambda: task(*args))
+    else:
+        transaction.on_commit(
+            lambda: get_executor().submit(_run_in_thread, task, *args)
+        )
@@ -0,0 +1,115 @@
+from django.db import transaction
+
+from recipes.feed import backfill, remove_authors
+from recipes.counters import change_counters
+from recipes.models import Recipes
+from recipes.relations import (FAVORITES, FOLLOWING, RELATIONS, SHOPPING_CART,
+                               invalidate_relations)
+from recipes.returning import delete_returning, insert_ignoring_conflicts
+from recipes.shopping import change_shopping_list
+from recipes.similar import mark_stale
+from users.models import CustomUser
+
+CREATED = "created"
+EXISTS = "exists"
+DELETED = "deleted"
+MISSING = "missing"
+NOT_FOUND = "not_found"
+
+
+def favorites_changed(user_id, recipe_ids, sign):
+    change_counters(Recipes, recipe_ids, "favorites_count", sign)
+    mark_stale(recipe_ids)
+
+
+def cart_changed(user_id, recipe_ids, sign):
+    change_counters(Recipes, recipe_ids, "shopping_carts_count", sign)
+    mark_stale(recipe_ids)
+    change_shopping_list(user_id, recipe_ids, sign)
+
+
+def following_changed(user_id, author_ids, sign):
+    change_counters(CustomUser, author_ids, "followers_count", sign)
+    if sign < 0:
+        remove_authors(user_id, author_ids)
+        return
+    for author_id in author_ids:
+        backfill(user_id, author_id)
+
+
+# INSERT ... ON CONFLICT и DELETE без сборщика Django не вызывают
+# сигналы, поэтому то, что делают их обработчики, выполняется здесь:
+# один раз на связь или на пачку. Связь пользователя с объектом
+# уникальна, так что счётчик каждого объекта меняется ровно на sign
+SIDE_EFFECTS = {
+    FAVORITES: favorites_changed,
+    SHOPPING_CART: cart_changed,
+    FOLLOWING: following_changed,
+}
+
+
+@transaction.atomic
+def add_relation(kind, user_id, target_id):
+    """Создаёт связь одним INSERT; False, если она уже была"""
+    model, field = RELATIONS[kind]
+    if not insert_ignoring_conflicts(
+        [model(user_id=user_id, **{field: target_id})], field
+    ):
+        return False
+    SIDE_EFFECTS[kind](user_id, [target_id], 1)
+    invalidate_relations(user_id, kind)
+    return True
+
+
+@transaction.atomic
+def remove_relation(kind, user_id, target_id):
+    """Удаляет связь одним DELETE; False, если её не было"""
+    model, field = RELATIONS[kind]
+    if not delete_returning(model.objects.filter(
+        user_id=user_id, **{field: target_id}
+    ), field):
+        return False
+    SIDE_EFFECTS[kind](user_id, [target_id], -1)
+    invalidate_relations(user_id, kind)
+    return True
+
+
+@transaction.atomic
+def add_relations(kind, user_id, target_ids):
+    """Создаёт недостающие связи одним INSERT, возвращает id созданных"""
+    model, field = RELATIONS[kind]
+    created = insert_ignoring_conflicts(
+        [model(user_id=user_id, **{field: pk}) for pk in target_ids], field
+    )
+    if created:
+        SIDE_EFFECTS[kind](user_id, created, 1)
+        invalidate_relations(user_id, kind)
+    return created
+
+
+@transaction.atomic
+def remove_relations(kind, user_id, target_ids):
+    """Удаляет связи одним DELETE, возвращает id удалённых"""
+    model, field = RELATIONS[kind]
+    removed = delete_returning(model.objects.filter(
+        user_id=user_id, **{f"{field}__in": target_ids}
+    ), field)
+    if removed:
+        SIDE_EFFECTS[kind](user_id, removed, -1)
+        invalidate_relations(user_id, kind)
+    return removed
+
+
+def change_relations(kind, user_id, target_ids, valid_ids, add):
+    """Добавляет или удаляет связи пачкой, возвращает статус каждого id"""
+    statuses = dict.fromkeys(target_ids, NOT_FOUND)
+    valid = [pk for pk in statuses if pk in valid_ids]
+    if add:
+        statuses.update(dict.fromkeys(valid, EXISTS))
+        changed = add_relations(kind, user_id, valid) if valid else []
+        statuses.update(dict.fromkeys(changed, CREATED))
+    else:
+        statuses.update(dict.fromkeys(valid, MISSING))
+        changed = remove_relations(kind, user_id, valid) if valid else []
+        statuses.update(dict.fromkeys(changed, DELETED))
+    return [{"id": pk, "status": status} for pk, status in statuses.items()]
@@ -0,0 +1,34 @@
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+TAGS = "tags"
+INGREDIENTS = "ingredients"
+
+
+def version_key(catalog):
+    return f"catalog:{catalog}:version"
+
+
+def bump_catalog_version(catalog):
+    """Новая версия справочника: сбрасывает кэши и ETag его ответов.
+
+    Меняется после фиксации транзакции, иначе параллельный запрос
+    закэширует старый справочник под новой версией.
+    """
+    transaction.on_commit(lambda: cache.set(
+        version_key(catalog), (uuid.uuid4().hex, time.time()), None
+    ))
+
+
+def get_catalog_version(catalog):
+    """Пара (токен версии, время изменения) справочника"""
+    version = cache.get(version_key(catalog))
+    if version is None:
+        cache.add(
+            version_key(catalog), (uuid.uuid4().hex, time.time()), None
+        )
+        version = cache.get(version_key(catalog))
+    return version
@@ -0,0 +1,220 @@
+import heapq
+import threading
+import uuid
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict, namedtuple
+from itertools import chain, groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import AmountIngredients
+
+TOKEN_KEY = "cookable:token"
+SEQUENCE_KEY = "cookable:sequence"
+
+Snapshot = namedtuple("Snapshot", ("token", "sequence", "postings", "sizes"))
+
+
+def change_key(number):
+    return f"cookable:change:{number}"
+
+
+def get_token():
+    token = cache.get(TOKEN_KEY)
+    if token is None:
+        cache.add(TOKEN_KEY, uuid.uuid4().hex, None)
+        token = cache.get(TOKEN_KEY)
+    return token
+
+
+def reset_cookable_index():
+    """Полная пересборка индекса во всех процессах: после массовых вставок"""
+    cache.set(TOKEN_KEY, uuid.uuid4().hex, None)
+
+
+def _record(recipe_ids):
+    for recipe_id in recipe_ids:
+        try:
+            number = cache.incr(SEQUENCE_KEY)
+        except ValueError:
+            cache.add(SEQUENCE_KEY, 0, None)
+            number = cache.incr(SEQUENCE_KEY)
+        cache.set(
+            change_key(number), recipe_id, settings.COOKABLE_CHANGES_TIMEOUT
+        )
+
+
+def record_recipe_changes(recipe_ids):
+    """Журнал изменённых рецептов: процессы доиндексируют только их"""
+    recipe_ids = [pk for pk in recipe_ids if pk is not None]
+    if recipe_ids:
+        transaction.on_commit(lambda: _record(recipe_ids))
+
+
+def grow(sizes, recipe_id):
+    missing = recipe_id + 1 - len(sizes)
+    if missing > 0:
+        sizes.frombytes(bytes(sizes.itemsize * missing))
+
+
+def contains(posting, recipe_id):
+    position = bisect_left(posting, recipe_id)
+    return position < len(posting) and posting[position] == recipe_id
+
+
+class Ranking:
+    """Кандидаты от меньшего числа недостающих ингредиентов к большему.
+
+    Целиком не сортируется: срез берётся из кучи, поэтому страница
+    стоит O(n log k), а не O(n log n).
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, item):
+        start, stop, _ = item.indices(len(self.keys))
+        return [
+            (-negative_id, missing)
+            for missing, _, negative_id in heapq.nsmallest(
+                stop, self.keys
+            )[start:stop]
+        ]
+
+
+class CookableIndex:
+    """Обратный индекс в памяти процесса: ингредиент -> id рецептов.
+
+    Для каждого ингредиента id рецептов лежат отсортированными
+    array("I"), разбитыми по числу ингредиентов в рецепте: рецепту из
+    s ингредиентов, которому недостаёт не больше m, нужно совпасть хотя
+    бы по s - m, поэтому группы больше len(ingredients) + m даже не
+    читаются. Изменения рецептов берутся из журнала в кэше и
+    применяются к копии индекса без полной пересборки.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    @staticmethod
+    def _build(token, sequence):
+        flat, sizes = {}, array("H")
+        rows = AmountIngredients.objects.filter(
+            ingredients__isnull=False, recipe__isnull=False
+        ).order_by("ingredients_id", "recipe_id").values_list(
+            "ingredients_id", "recipe_id"
+        ).iterator(chunk_size=10000)
+        for ingredient_id, group in groupby(rows, key=lambda row: row[0]):
+            posting = flat[ingredient_id] = array(
+                "I", (recipe_id for _, recipe_id in group)
+            )
+            grow(sizes, posting[-1])
+            for recipe_id in posting:
+                sizes[recipe_id] += 1
+        postings = {}
+        for ingredient_id, posting in flat.items():
+            groups = postings[ingredient_id] = {}
+            for recipe_id in posting:
+                size = sizes[recipe_id]
+                if size not in groups:
+                    groups[size] = array("I")
+                groups[size].append(recipe_id)
+        return Snapshot(token, sequence, postings, sizes)
+
+    @staticmethod
+    def _apply(snapshot, sequence, recipe_ids):
+        wanted = defaultdict(set)
+        for recipe_id, ingredient_id in AmountIngredients.objects.filter(
+            recipe_id__in=recipe_ids, ingredients__isnull=False
+        ).values_list("recipe_id", "ingredients_id"):
+            wanted[recipe_id].add(ingredient_id)
+        postings, sizes = dict(snapshot.postings), snapshot.sizes[:]
+        grow(sizes, max(recipe_ids))
+        copied = set()
+
+        def editable(ingredient_id, size):
+            if ingredient_id not in copied:
+                copied.add(ingredient_id)
+                postings[ingredient_id] = dict(postings.get(ingredient_id, {}))
+            groups = postings[ingredient_id]
+            if (ingredient_id, size) not in copied:
+                copied.add((ingredient_id, size))
+                groups[size] = array("I", groups.get(size, ()))
+            return groups[size]
+
+        for recipe_id in recipe_ids:
+            old_size, size = sizes[recipe_id], len(wanted[recipe_id])
+            if old_size:
+                for ingredient_id, groups in snapshot.postings.items():
+                    if contains(groups.get(old_size, ()), recipe_id):
+                        posting = editable(ingredient_id, old_size)
+                        del posting[bisect_left(posting, recipe_id)]
+            for ingredient_id in wanted[recipe_id]:
+                insort(editable(ingredient_id, size), recipe_id)
+            sizes[recipe_id] = size
+        return Snapshot(snapshot.token, sequence, postings, sizes)
+
+    def _catch_up(self, snapshot, token, sequence):
+        if (snapshot is None or snapshot.token != token
+                or sequence < snapshot.sequence
+                or sequence - snapshot.sequence
+                > settings.COOKABLE_MAX_CHANGES):
+            return self._build(token, sequence)
+        changes = cache.get_many([
+            change_key(number)
+            for number in range(snapshot.sequence + 1, sequence + 1)
+        ])
+        if len(changes) < sequence - snapshot.sequence:
+            return self._build(token, sequence)
+        return self._apply(snapshot, sequence, set(changes.values()))
+
+    def _load(self):
+        token = get_token()
+        sequence = cache.get(SEQUENCE_KEY, 0)
+        snapshot = self._snapshot
+        if (snapshot is not None and snapshot.token == token
+                and snapshot.sequence == sequence):
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if (snapshot is None or snapshot.token != token
+                    or snapshot.sequence != sequence):
+                snapshot = self._snapshot = self._catch_up(
+                    snapshot, token, sequence
+                )
+        return snapshot
+
+    def match(self, ingredient_ids, max_missing=None):
+        """Рецепты, которым недостаёт не больше max_missing ингредиентов.
+
+        Совпадения в каждой группе считает Counter по склеенным
+        спискам рецептов, в цикле на C.
+        """
+        if max_missing is None:
+            max_missing = settings.COOKABLE_MAX_MISSING
+        postings = self._load().postings
+        groups = [
+            postings.get(ingredient_id, {})
+            for ingredient_id in set(ingredient_ids)
+        ]
+        keys = []
+        for size in range(1, len(groups) + max_missing + 1):
+            matched = Counter(chain.from_iterable(
+                group.get(size, ()) for group in groups
+            ))
+            least = size - max_missing
+            keys.extend(
+                (size - count, -count, -recipe_id)
+                for recipe_id, count in matched.items() if count >= least
+            )
+        return Ranking(keys)
+
+
+cookable_index = CookableIndex()
@@ -0,0 +1,34 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def change_counters(model, pks, field, delta):
+    """Атомарно меняет счётчик строк, не опуская его ниже нуля.
+
+    F() вычисляется по текущей строке под её блокировкой, поэтому
+    параллельные изменения складываются, а не затирают друг друга.
+    """
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f"{field}__gte": -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_counter(model, pk, field, delta):
+    if pk is not None:
+        change_counters(model, [pk], field, delta)
+
+
+def count_subquery(model, field):
+    """Подзапрос: число строк model, ссылающихся на внешнюю строку"""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
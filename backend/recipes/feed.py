@@ -0,0 +1,146 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from recipes.models import FeedItem, Recipes
+from users.models import CustomUser, Follow
+
+PULL_AUTHORS_KEY = "feed:pull_authors"
+
+
+def is_pull_author(followers_count):
+    """Авторам с огромным числом подписчиков ленты не рассылаются"""
+    return followers_count > settings.FEED_FANOUT_LIMIT
+
+
+def get_pull_authors():
+    """id авторов, чьи рецепты подмешиваются в ленту при чтении"""
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        authors = frozenset(CustomUser.objects.filter(
+            followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list("pk", flat=True))
+        cache.set(
+            PULL_AUTHORS_KEY, authors, settings.FEED_PULL_AUTHORS_TIMEOUT
+        )
+    return authors
+
+
+def insert_items(items):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, settings.FEED_BATCH_SIZE))
+        if not batch:
+            return
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(recipe_id):
+    """Добавляет новый рецепт в ленты всех подписчиков автора"""
+    recipe = Recipes.objects.filter(pk=recipe_id).values_list(
+        "author_id", "published", "author__followers_count"
+    ).first()
+    if recipe is None:
+        return
+    author_id, published, followers_count = recipe
+    if is_pull_author(followers_count):
+        return
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        "user_id", flat=True
+    ).iterator(chunk_size=settings.FEED_BATCH_SIZE)
+    insert_items(
+        FeedItem(
+            user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+            published=published,
+        )
+        for user_id in followers
+    )
+
+
+def backfill(user_id, author_id):
+    """Новая подписка: последние рецепты автора попадают в ленту"""
+    followers_count = CustomUser.objects.filter(pk=author_id).values_list(
+        "followers_count", flat=True).first()
+    if followers_count is None or is_pull_author(followers_count):
+        return
+    insert_items(
+        FeedItem(
+            user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+            published=published,
+        )
+        for recipe_id, published in Recipes.objects.filter(
+            author_id=author_id
+        ).order_by("-published", "-id").values_list(
+            "pk", "published"
+        )[:settings.FEED_BACKFILL_SIZE]
+    )
+
+
+def remove_authors(user_id, author_ids):
+    """Отписка: рецепты авторов убираются из ленты"""
+    FeedItem.objects.filter(user_id=user_id, author_id__in=author_ids).delete()
+
+
+def rebuild_feeds(user_ids):
+    """Пересобирает ленты пользователей из их подписок"""
+    for user_id in user_ids:
+        FeedItem.objects.filter(user_id=user_id).delete()
+        insert_items(
+            FeedItem(
+                user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+                published=published,
+            )
+            for recipe_id, author_id, published in Recipes.objects.filter(
+                author__in=Follow.objects.filter(
+                    user_id=user_id,
+                    author__followers_count__lte=settings.FEED_FANOUT_LIMIT,
+                ).values("author_id")
+            ).order_by("-published", "-id").values_list(
+                "pk", "author_id", "published"
+            )[:settings.FEED_BACKFILL_SIZE]
+        )
+
+
+def before_key(before, published, pk):
+    if before is None:
+        return Q()
+    when, before_pk = before
+    return Q(**{f"{published}__lt": when}) | Q(
+        **{published: when, f"{pk}__lt": before_pk})
+
+
+def get_feed(user_id, following, limit, before=None):
+    """Пары (published, id рецепта) ленты, от новых к старым.
+
+    Рецепты обычных авторов читаются из FeedItem одним диапазоном по
+    индексу (user, -published, -recipe). Рецепты авторов, которым
+    лента не рассылается, берутся из Recipes по каждому автору и
+    сливаются с ней k-путевым слиянием.
+    """
+    sources = [
+        FeedItem.objects.filter(user_id=user_id).filter(
+            before_key(before, "published", "recipe_id")
+        ).order_by("-published", "-recipe_id").values_list(
+            "published", "recipe_id"
+        )[:limit]
+    ]
+    for author_id in sorted(set(following) & get_pull_authors()):
+        sources.append(
+            Recipes.objects.filter(author_id=author_id).filter(
+                before_key(before, "published", "pk")
+            ).order_by("-published", "-id").values_list(
+                "published", "pk"
+            )[:limit]
+        )
+    entries, seen = [], set()
+    for published, recipe_id in heapq.merge(*sources, reverse=True):
+        if recipe_id in seen:
+            continue
+        seen.add(recipe_id)
+        entries.append((published, recipe_id))
+        if len(entries) == limit:
+            break
+    return entries
@@ -0,0 +1,81 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.catalog import INGREDIENTS, TAGS, get_catalog_version
+
+
+def recipe_version_key(recipe_id):
+    return f"fragments:recipe:{recipe_id}:version"
+
+
+def author_version_key(author_id):
+    return f"fragments:author:{author_id}:version"
+
+
+def _bump(key):
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, None))
+
+
+def invalidate_recipe_fragment(recipe_id):
+    """Сбрасывает кэш представления рецепта после фиксации транзакции"""
+    _bump(recipe_version_key(recipe_id))
+
+
+def invalidate_author_fragments(author_id):
+    """Сбрасывает кэш представлений всех рецептов автора"""
+    _bump(author_version_key(author_id))
+
+
+def _get_versions(keys):
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+def get_fragments(recipes, build):
+    """Общая для всех пользователей часть представления рецептов.
+
+    Ключ фрагмента складывается из версий рецепта, его автора и
+    справочников тегов и ингредиентов, так что любая из этих записей
+    делает старый фрагмент недостижимым. Промахи собираются одним
+    вызовом build(recipes) -> {id: фрагмент}.
+    """
+    version_keys = set()
+    for recipe in recipes:
+        version_keys.add(recipe_version_key(recipe.id))
+        version_keys.add(author_version_key(recipe.author_id))
+    versions = _get_versions(list(version_keys))
+    catalogs = "{}:{}".format(
+        get_catalog_version(TAGS)[0], get_catalog_version(INGREDIENTS)[0]
+    )
+    keys = {
+        recipe.id: "fragments:{}:{}:{}:{}".format(
+            recipe.id,
+            versions.get(recipe_version_key(recipe.id)),
+            versions.get(author_version_key(recipe.author_id)),
+            catalogs,
+        )
+        for recipe in recipes
+    }
+    cached = cache.get_many(keys.values())
+    fragments = {
+        recipe_id: cached[key]
+        for recipe_id, key in keys.items() if key in cached
+    }
+    missing = [recipe for recipe in recipes if recipe.id not in fragments]
+    if missing:
+        fresh = build(missing)
+        cache.set_many(
+            {keys[recipe_id]: fragment for recipe_id, fragment
+             in fresh.items()},
+            settings.RECIPE_FRAGMENT_CACHE_TIMEOUT
+        )
+        fragments.update(fresh)
+    return fragments
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from PIL import Image, features
+from sorl.thumbnail import get_thumbnail
+
+from recipes.background import run_after_commit
+from recipes.fragments import invalidate_recipe_fragment
+from recipes.models import Recipes
+
+
+def get_image_format():
+    image_format = settings.RECIPE_IMAGE_FORMAT.upper()
+    if image_format == "WEBP" and not features.check("webp"):
+        return "JPEG"
+    return image_format
+
+
+def check_image(file):
+    """Проверяет заголовок картинки без полного декодирования"""
+    if file.size > settings.RECIPE_IMAGE_MAX_SIZE:
+        raise ValidationError("Слишком большой файл картинки")
+    position = file.tell()
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+            image.verify()
+    except Exception as error:
+        raise ValidationError("Файл не является картинкой") from error
+    finally:
+        file.seek(position)
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise ValidationError("Слишком большое разрешение картинки")
+
+
+def generate_renditions(recipe_id):
+    """Создаёт уменьшенные копии картинки рецепта без метаданных"""
+    recipe = Recipes.objects.filter(pk=recipe_id).only("image").first()
+    if recipe is None or not recipe.image:
+        return {}
+    image_format = get_image_format()
+    renditions = {
+        name: get_thumbnail(
+            recipe.image, geometry, format=image_format,
+            quality=settings.RECIPE_IMAGE_QUALITY, **options
+        ).name
+        for name, (geometry, options)
+        in settings.RECIPE_IMAGE_RENDITIONS.items()
+    }
+    Recipes.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(renditions=renditions)
+    invalidate_recipe_fragment(recipe_id)
+    return renditions
+
+
+def schedule_renditions(recipe_id):
+    """Запускает обработку картинки после фиксации транзакции"""
+    run_after_commit(generate_renditions, recipe_id)
+
+
+def rendition_urls(recipe):
+    """URL уменьшенных копий, а пока их нет - URL оригинала"""
+    original = recipe.image.url if recipe.image else None
+    renditions = recipe.renditions or {}
+    return {
+        name: (
+            default_storage.url(renditions[name])
+            if name in renditions else original
+        )
+        for name in settings.RECIPE_IMAGE_RENDITIONS
+    }
@@ -1,30 +1,130 @@
 import csv
+import json
+import os
+import time
+from itertools import islice
 
-from django.core.management import BaseCommand
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
 
+from recipes.catalog import INGREDIENTS, TAGS, bump_catalog_version
 from recipes.models import Ingredients, Tags
 
+DATA_DIR = os.path.join(settings.BASE_DIR, 'data')
+INGREDIENT_FIELDS = ('name', 'measurement_unit')
+TAG_FIELDS = ('name', 'color', 'slug')
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(path, fields):
+    """Построчно читает CSV, пропуская строку заголовка, если она есть."""
+    with open(path, encoding='utf-8', newline='') as file:
+        for row in csv.reader(file):
+            if not row or tuple(row) == fields:
+                continue
+            yield dict(zip(fields, row))
+
+
+def read_json(path, fields):
+    """Читает JSON-массив объектов по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as file:
+        buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+        if not buffer.startswith('['):
+            raise CommandError(f'{path}: ожидается JSON-массив')
+        buffer = buffer[1:]
+        while True:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                chunk = file.read(JSON_CHUNK_SIZE)
+                if not chunk:
+                    raise CommandError(f'{path}: некорректный JSON')
+                buffer += chunk
+                continue
+            buffer = buffer[end:]
+            yield {field: item[field] for field in fields}
+
+
+def read_rows(path, fields):
+    readers = {'.csv': read_csv, '.json': read_json}
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in readers:
+        raise CommandError(f'{path}: поддерживаются только CSV и JSON')
+    if not os.path.exists(path):
+        raise CommandError(f'{path}: файл не найден')
+    return readers[extension](path, fields)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты и теги из CSV или JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            default=os.path.join(DATA_DIR, 'ingredients.csv'),
+            help='Путь к файлу ингредиентов (.csv или .json)'
+        )
+        parser.add_argument(
+            '--tags',
+            default=os.path.join(DATA_DIR, 'tags.csv'),
+            help='Путь к файлу тегов (.csv или .json)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном INSERT'
+        )
+
+    def import_rows(self, model, path, fields, batch_size):
+        """Вставляет новые строки пачками, пропуская уже известные ключи."""
+        seen = set(model.objects.values_list(*fields))
+        started = time.monotonic()
+        total = created = 0
+        for chunk in chunked(read_rows(path, fields), batch_size):
+            total += len(chunk)
+            objects = []
+            for row in chunk:
+                key = tuple(row[field].strip() for field in fields)
+                if key in seen:
+                    continue
+                seen.add(key)
+                objects.append(model(**dict(zip(fields, key))))
+            model.objects.bulk_create(
+                objects, batch_size=batch_size, ignore_conflicts=True
+            )
+            created += len(objects)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: прочитано {total}, '
+            f'новых {created}, {total / elapsed:.0f} строк/с'
+        )
+
     def handle(self, *args, **options):
-        with open('./data/ingredients.csv', encoding='utf-8') as _file:
-            reader = csv.reader(_file)
-            next(reader)
-            for row in reader:
-                name, unit = row
-                Ingredients.objects.get_or_create(
-                    name=name,
-                    measurement_unit=unit
-                )
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        with transaction.atomic():
+            self.import_rows(
+                Ingredients, options['ingredients'],
+                INGREDIENT_FIELDS, batch_size
+            )
+            bump_catalog_version(INGREDIENTS)
             self.stdout.write("Ingredients import successfully")
-
-        with open('./data/tags.csv', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                name, color, slug = row
-                Tags.objects.get_or_create(
-                    name=name,
-                    color=color,
-                    slug=slug
-                )
+            self.import_rows(Tags, options['tags'], TAG_FIELDS, batch_size)
+            bump_catalog_version(TAGS)
             self.stdout.write("Tags import successfully")
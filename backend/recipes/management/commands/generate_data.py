@@ -0,0 +1,74 @@
+import os
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from recipes.models import Ingredients
+from recipes.synthetic import BATCH_SIZE, ZIPF_EXPONENT, Scale, generate
+
+
+class Command(BaseCommand):
+    help = (
+        "Создаёт синтетических пользователей, рецепты, подписки, избранное "
+        "и корзины в объёмах продакшена"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--recipes", type=int, default=100000)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument(
+            "--follows", type=int, default=20,
+            help="Среднее число подписок пользователя"
+        )
+        parser.add_argument(
+            "--favorites", type=int, default=30,
+            help="Среднее число рецептов в избранном"
+        )
+        parser.add_argument(
+            "--carts", type=int, default=5,
+            help="Среднее число рецептов в корзине"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--prefix", default="synthetic_",
+            help="Префикс имён пользователей и рецептов этого прогона"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Число процессов для вставки (в SQLite всегда 1)"
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--zipf", type=float, default=ZIPF_EXPONENT,
+            help="Показатель распределения популярности"
+        )
+        parser.add_argument(
+            "--skip-derived", action="store_true",
+            help="Не пересчитывать счётчики, поиск, ленты и другие производные"
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--workers и --batch-size должны быть больше 0")
+        if not Ingredients.objects.exists():
+            raise CommandError("Сначала загрузите ингредиенты: add_data")
+        scale = Scale(
+            options["users"], options["recipes"],
+            options["ingredients_per_recipe"], options["follows"],
+            options["favorites"], options["carts"],
+        )
+        started = time.monotonic()
+        generate(
+            scale,
+            seed=options["seed"],
+            prefix=options["prefix"],
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            exponent=options["zipf"],
+            derived=not options["skip_derived"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(
+            f"Готово за {time.monotonic() - started:.1f} с"
+        )
@@ -0,0 +1,47 @@
+from django.core.management import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from recipes.feed import rebuild_feeds
+from recipes.models import FeedItem
+from users.models import CustomUser, Follow
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Пересобирает ленты подписок пользователей"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="users",
+            help="id пользователя, можно указать несколько раз",
+        )
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Только пользователи с подписками, но без ленты",
+        )
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.filter(
+            Exists(Follow.objects.filter(user=OuterRef("pk")))
+        ).order_by("pk")
+        if options["users"]:
+            users = users.filter(pk__in=options["users"])
+        if options["missing"]:
+            users = users.exclude(
+                Exists(FeedItem.objects.filter(user=OuterRef("pk")))
+            )
+        ids = users.values_list("pk", flat=True)
+        total, last_pk = 0, 0
+        while True:
+            batch = list(ids.filter(pk__gt=last_pk)[:BATCH_SIZE])
+            if not batch:
+                break
+            rebuild_feeds(batch)
+            total += len(batch)
+            last_pk = batch[-1]
+        self.stdout.write(f"Пересобрано лент: {total}")
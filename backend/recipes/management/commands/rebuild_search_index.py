@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from recipes.models import Recipes
+from recipes.search import BATCH_SIZE, refresh_search_documents
+
+
+class Command(BaseCommand):
+    help = "Пересобирает поисковый текст всех рецептов"
+
+    def handle(self, *args, **options):
+        ids = Recipes.objects.order_by("pk").values_list("pk", flat=True)
+        total, last_pk = 0, 0
+        while True:
+            batch = list(ids.filter(pk__gt=last_pk)[:BATCH_SIZE])
+            if not batch:
+                break
+            total += refresh_search_documents(batch)
+            last_pk = batch[-1]
+        self.stdout.write(f"Обновлено рецептов: {total}")
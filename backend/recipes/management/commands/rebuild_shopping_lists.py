@@ -0,0 +1,22 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.shopping import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = "Пересобирает сводные списки покупок из корзин пользователей"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="users",
+            help="id пользователя, можно указать несколько раз",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_shopping_lists(options["users"])
+        self.stdout.write(f"Строк в списках покупок: {total}")
@@ -0,0 +1,25 @@
+from django.core.management import BaseCommand
+
+from recipes.models import Recipes
+from recipes.similar import refresh_stale_similar
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает похожие рецепты для рецептов, у которых менялось "
+        "избранное или корзина. Запускается периодически, например cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Пересчитать все рецепты",
+        )
+        parser.add_argument("--batch-size", type=int)
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            Recipes.objects.update(similar_stale=True)
+        total = refresh_stale_similar(options["batch_size"])
+        self.stdout.write(f"Пересчитано рецептов: {total}")
@@ -0,0 +1,43 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from recipes.counters import count_subquery
+from recipes.models import Favorite, Recipes, ShoppingList
+from users.models import CustomUser, Follow
+
+
+COUNTERS = (
+    (Recipes, "favorites_count", Favorite, "recipe"),
+    (Recipes, "shopping_carts_count", ShoppingList, "recipe"),
+    (CustomUser, "recipes_count", Recipes, "author"),
+    (CustomUser, "followers_count", Follow, "author"),
+)
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает денормализованные счётчики и исправляет расхождения"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать число строк с расхождением",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model, field, related, related_field in COUNTERS:
+                actual = count_subquery(related, related_field)
+                drifted = model.objects.annotate(actual=actual).exclude(
+                    **{field: F("actual")}
+                )
+                if options["dry_run"]:
+                    drift = drifted.count()
+                else:
+                    drift = model.objects.filter(
+                        pk__in=drifted.values("pk")
+                    ).update(**{field: actual})
+                self.stdout.write(
+                    f"{model._meta.label}.{field}: расхождений {drift}"
+                )
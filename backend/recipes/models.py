@@ -2,6 +2,7 @@ from colorfield.fields import ColorField
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models import UniqueConstraint
+from django.utils import timezone
 
 from users.models import CustomUser
 
@@ -73,6 +74,12 @@ class Recipes(models.Model):
         null=False,
         verbose_name="Картинка_блюда",
     )
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Уменьшенные_копии_картинки",
+    )
     text = models.TextField(
         help_text="Введите текст отзыва",
         verbose_name="Описание_блюда",
@@ -94,11 +101,45 @@ class Recipes(models.Model):
         validators=(MinValueValidator(1, message="Минимальное значение 1!"),)
     )
     published = models.DateTimeField("Дата публикации", auto_now_add=True)
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число_в_избранном",
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число_в_покупках",
+    )
+    search_document = models.TextField(
+        blank=True,
+        default="",
+        editable=False,
+        verbose_name="Текст_для_поиска",
+    )
+    similar_stale = models.BooleanField(
+        default=True,
+        editable=False,
+        verbose_name="Похожие_рецепты_устарели",
+    )
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ("name",)
+        indexes = [
+            models.Index(
+                fields=("-published", "-id"),
+                name="recipes_published_id_idx"),
+            models.Index(
+                fields=("author", "-published", "-id"),
+                name="recipes_author_published_idx"),
+            models.Index(
+                fields=("id",),
+                condition=models.Q(similar_stale=True),
+                name="recipes_similar_stale_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -147,6 +188,10 @@ class TagsRecipes(models.Model):
 
     class Meta:
         verbose_name = "Теги_Рецепта"
+        indexes = [
+            models.Index(
+                fields=("tag", "recipe"), name="tagsrecipes_tag_recipe_idx"),
+        ]
 
     def __str__(self):
         return f"Теги_ {self.tag} для рецепта_ {self.recipe}"
@@ -197,6 +242,7 @@ class ShoppingList(models.Model):
         related_name="shoppinglist",
         verbose_name="Рецепт"
     )
+    added = models.DateTimeField("Дата добавления", default=timezone.now)
 
     class Meta:
         verbose_name = "Список_Покупок"
@@ -208,3 +254,105 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f"{self.user} - {self.recipe}"
+
+
+class ShoppingListItem(models.Model):
+    """Сводный список покупок: сумма ингредиента по рецептам в корзине"""
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+        verbose_name="Юзер",
+    )
+    ingredients = models.ForeignKey(
+        Ingredients,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+        verbose_name="Ингредиент",
+    )
+    amount = models.PositiveIntegerField("Количество", default=0)
+
+    class Meta:
+        verbose_name = "Сводный_список_покупок"
+        constraints = [
+            UniqueConstraint(
+                fields=("user", "ingredients"),
+                name="unique_shopping_list_item")
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.ingredients} {self.amount}"
+
+
+class FeedItem(models.Model):
+    """Лента подписок: рецепт автора, на которого подписан пользователь"""
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="feed_items",
+        verbose_name="Юзер",
+    )
+    recipe = models.ForeignKey(
+        Recipes,
+        on_delete=models.CASCADE,
+        related_name="feed_items",
+        verbose_name="Рецепт",
+    )
+    author = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Автор",
+    )
+    published = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        verbose_name = "Лента_подписок"
+        constraints = [
+            UniqueConstraint(
+                fields=("user", "recipe"),
+                name="unique_feed_item")
+        ]
+        indexes = [
+            models.Index(
+                fields=("user", "-published", "-recipe"),
+                name="feed_user_published_idx"),
+            models.Index(
+                fields=("user", "author"), name="feed_user_author_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.recipe}"
+
+
+class SimilarRecipe(models.Model):
+    """Похожий рецепт: его часто добавляют те же пользователи"""
+    recipe = models.ForeignKey(
+        Recipes,
+        on_delete=models.CASCADE,
+        related_name="similar_recipes",
+        verbose_name="Рецепт",
+    )
+    similar = models.ForeignKey(
+        Recipes,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Похожий_рецепт",
+    )
+    score = models.FloatField("Сходство")
+
+    class Meta:
+        verbose_name = "Похожий_рецепт"
+        verbose_name_plural = "Похожие_рецепты"
+        constraints = [
+            UniqueConstraint(
+                fields=("recipe", "similar"),
+                name="unique_similar_recipe")
+        ]
+        indexes = [
+            models.Index(
+                fields=("recipe", "-score"), name="similar_recipe_score_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe} ~ {self.similar}"
@@ -0,0 +1,97 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import Favorite, ShoppingList
+from users.models import Follow
+
+FAVORITES = "favorites"
+SHOPPING_CART = "shopping_cart"
+FOLLOWING = "following"
+
+RELATIONS = {
+    FAVORITES: (Favorite, "recipe_id"),
+    SHOPPING_CART: (ShoppingList, "recipe_id"),
+    FOLLOWING: (Follow, "author_id"),
+}
+RELATION_KINDS = {
+    Favorite: FAVORITES,
+    ShoppingList: SHOPPING_CART,
+    Follow: FOLLOWING,
+}
+
+
+def version_key(user_id, kind):
+    return f"relations:{user_id}:{kind}:version"
+
+
+def invalidate_relations(user_id, kind):
+    """Меняет версию набора после фиксации транзакции.
+
+    Раньше нельзя: параллельный запрос прочитал бы ещё не
+    зафиксированный набор и сохранил его под новой версией.
+    """
+    key = version_key(user_id, kind)
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, None))
+
+
+class UserRelations:
+    """Множества id рецептов и авторов, связанных с пользователем.
+
+    Загружаются один раз на запрос: из кэша по версионированным ключам,
+    а при промахе - одним запросом к базе на каждый набор.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._sets = None
+
+    def _versions(self):
+        keys = {kind: version_key(self.user_id, kind) for kind in RELATIONS}
+        versions = cache.get_many(keys.values())
+        missing = {
+            keys[kind]: uuid.uuid4().hex
+            for kind in RELATIONS if keys[kind] not in versions
+        }
+        if missing:
+            for key, value in missing.items():
+                cache.add(key, value, None)
+            versions.update(cache.get_many(missing))
+        return {kind: versions.get(key) for kind, key in keys.items()}
+
+    def _load(self):
+        keys = {
+            kind: f"relations:{self.user_id}:{kind}:{version}"
+            for kind, version in self._versions().items()
+        }
+        cached = cache.get_many(keys.values())
+        sets, fresh = {}, {}
+        for kind, key in keys.items():
+            if key in cached:
+                sets[kind] = cached[key]
+                continue
+            model, field = RELATIONS[kind]
+            sets[kind] = fresh[key] = frozenset(model.objects.filter(
+                user_id=self.user_id).values_list(field, flat=True))
+        if fresh:
+            cache.set_many(fresh, settings.RELATIONS_CACHE_TIMEOUT)
+        return sets
+
+    def get(self, kind):
+        if self._sets is None:
+            self._sets = self._load()
+        return self._sets[kind]
+
+    def contains(self, kind, pk):
+        return pk in self.get(kind)
+
+
+def get_user_relations(request):
+    """UserRelations текущего пользователя, общий для всего запроса"""
+    relations = getattr(request, "_user_relations", None)
+    if relations is None or relations.user_id != request.user.id:
+        relations = UserRelations(request.user.id)
+        request._user_relations = relations
+    return relations
@@ -0,0 +1,85 @@
+"""INSERT и DELETE, сообщающие, какие строки изменил сам запрос.
+
+ORM Django 3.2 этого не умеет: bulk_create(ignore_conflicts=True)
+не возвращает вставленные строки, а QuerySet.delete() считает строки
+чтением до удаления. Поэтому запросы собираются здесь из публичного
+API полей и querysets и дополняются RETURNING. ON CONFLICT и RETURNING
+есть в PostgreSQL и в SQLite с 3.35; на других базах функции бросают
+NotSupportedError, а не возвращают тихо неверный результат.
+"""
+from django.db import NotSupportedError, connections, router
+
+SQLITE_RETURNING = (3, 35)
+
+
+def check_returning(connection):
+    if connection.vendor == "postgresql":
+        return
+    if (connection.vendor == "sqlite"
+            and connection.Database.sqlite_version_info >= SQLITE_RETURNING):
+        return
+    raise NotSupportedError(
+        f"INSERT/DELETE ... RETURNING не поддерживается: {connection.vendor}"
+    )
+
+
+def fetch_returning(connection, statement, params):
+    with connection.cursor() as cursor:
+        cursor.execute(statement, params)
+        return [value for value, in cursor.fetchall()]
+
+
+def insert_ignoring_conflicts(instances, field):
+    """INSERT ... ON CONFLICT DO NOTHING, возвращает field новых строк.
+
+    Строки, которые уже были или которые параллельно вставила другая
+    транзакция, в ответ не попадают.
+    """
+    if not instances:
+        return []
+    model = type(instances[0])
+    connection = connections[router.db_for_write(model)]
+    check_returning(connection)
+    quote = connection.ops.quote_name
+    fields = [
+        model_field for model_field in model._meta.concrete_fields
+        if model_field is not model._meta.auto_field
+    ]
+    returning = quote(model._meta.get_field(field).column)
+    values = []
+    batch_size = connection.ops.bulk_batch_size(fields, instances)
+    for start in range(0, len(instances), batch_size):
+        batch = instances[start:start + batch_size]
+        row = f"({', '.join(['%s'] * len(fields))})"
+        params = [
+            model_field.get_db_prep_save(
+                model_field.pre_save(instance, True), connection
+            )
+            for instance in batch for model_field in fields
+        ]
+        values.extend(fetch_returning(connection, (
+            f"INSERT INTO {quote(model._meta.db_table)} "
+            f"({', '.join(quote(f.column) for f in fields)}) "
+            f"VALUES {', '.join([row] * len(batch))} "
+            f"ON CONFLICT DO NOTHING RETURNING {returning}"
+        ), params))
+    return values
+
+
+def delete_returning(queryset, field):
+    """DELETE строк queryset без сборщика Django, возвращает их field.
+
+    Сигналы и каскады не выполняются. Строку, которую параллельно
+    удалила другая транзакция, возвращает только она.
+    """
+    model = queryset.model
+    connection = connections[router.db_for_write(model)]
+    check_returning(connection)
+    quote = connection.ops.quote_name
+    pk_column = quote(model._meta.pk.column)
+    select, params = queryset.values("pk").query.sql_with_params()
+    return fetch_returning(connection, (
+        f"DELETE FROM {quote(model._meta.db_table)} "
+        f"WHERE {pk_column} IN ({select}) "
+        f"RETURNING {quote(model._meta.get_field(field).column)}"
+    ), params)
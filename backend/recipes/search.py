@@ -0,0 +1,95 @@
+from collections import defaultdict
+
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Length, StrIndex
+
+from recipes.models import AmountIngredients, Recipes
+
+SEARCH_CONFIG = "russian"
+BATCH_SIZE = 500
+
+POSTGRES_INDEXES = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS recipes_search_document_fts "
+    "ON recipes_recipes USING gin "
+    f"(to_tsvector('{SEARCH_CONFIG}'::regconfig, "
+    "COALESCE(search_document, '')))",
+    "CREATE INDEX IF NOT EXISTS recipes_search_document_trgm "
+    "ON recipes_recipes USING gin (search_document gin_trgm_ops)",
+)
+
+
+def normalize(value):
+    return " ".join(value.casefold().replace("ё", "е").split())
+
+
+def build_document(name, text, ingredients):
+    """Текст для поиска: название, ингредиенты, описание"""
+    return normalize(" ".join((name, " ".join(ingredients), text)))
+
+
+def refresh_search_documents(recipe_ids):
+    """Пересобирает search_document для переданных рецептов"""
+    recipe_ids = list(recipe_ids)
+    ingredients = defaultdict(list)
+    for recipe_id, name in AmountIngredients.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list("recipe_id", "ingredients__name"):
+        ingredients[recipe_id].append(name)
+    recipes = [
+        Recipes(pk=pk, search_document=build_document(
+            name, text, ingredients[pk]))
+        for pk, name, text in Recipes.objects.filter(
+            pk__in=recipe_ids
+        ).values_list("pk", "name", "text")
+    ]
+    Recipes.objects.bulk_update(
+        recipes, ("search_document",), batch_size=BATCH_SIZE
+    )
+    return len(recipes)
+
+
+def search_recipes(queryset, query):
+    """Фильтрует и ранжирует рецепты по поисковому запросу.
+
+    В Postgres используется полнотекстовый поиск по search_document
+    с GIN-индексом и триграммный LIKE для неполных слов. В остальных
+    базах - LIKE по каждому слову, выше совпадения в названии.
+    """
+    words = normalize(query).split()
+    if not words:
+        return queryset
+    if connections[queryset.db].vendor == "postgresql":
+        # Только для Postgres: без psycopg2 модуль работает на SQLite
+        from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                                    SearchVector)
+        vector = SearchVector("search_document", config=SEARCH_CONFIG)
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        partial = Q()
+        for word in words:
+            partial &= Q(search_document__contains=word)
+        return queryset.alias(search=vector).annotate(
+            rank=SearchRank(vector, search_query)
+        ).filter(Q(search=search_query) | partial).order_by(
+            "-rank", *Recipes._meta.ordering
+        )
+    for word in words:
+        queryset = queryset.filter(search_document__contains=word)
+    return queryset.annotate(
+        position=StrIndex("search_document", Value(words[0]))
+    ).annotate(rank=Case(
+        When(position__lte=Length("name"), then=Value(1.0)),
+        default=Value(0.5),
+        output_field=FloatField(),
+    )).order_by("-rank", "position", *Recipes._meta.ordering)
+
+
+def create_search_indexes(using, **kwargs):
+    """Создаёт GIN-индексы поиска в Postgres после миграций"""
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for statement in POSTGRES_INDEXES:
+            cursor.execute(statement)
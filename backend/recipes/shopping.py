@@ -0,0 +1,119 @@
+from itertools import islice
+
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from recipes.models import AmountIngredients, ShoppingList, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def change_items(user_ids, deltas):
+    """Прибавляет deltas {id ингредиента: количество} к спискам покупок.
+
+    Недостающие строки создаются пустыми, затем все суммы меняются
+    одним UPDATE, а обнулившиеся строки удаляются.
+    """
+    deltas = {
+        ingredient_id: delta for ingredient_id, delta in deltas.items()
+        if ingredient_id is not None and delta
+    }
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    added = [
+        ingredient_id for ingredient_id, delta in deltas.items() if delta > 0
+    ]
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(user_id=user_id, ingredients_id=ingredient_id)
+            for user_id in user_ids for ingredient_id in added
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredients_id__in=deltas.keys()
+    )
+    items.update(amount=Greatest(
+        F("amount") + Case(
+            *(When(ingredients_id=ingredient_id, then=Value(delta))
+              for ingredient_id, delta in deltas.items()),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    ))
+    items.filter(amount=0).delete()
+
+
+def recipe_amounts(recipe_id):
+    return dict(AmountIngredients.objects.filter(
+        recipe_id=recipe_id).values_list("ingredients_id", "amount"))
+
+
+def cart_users(recipe_id):
+    return ShoppingList.objects.filter(
+        recipe_id=recipe_id).values_list("user_id", flat=True)
+
+
+def add_to_shopping_list(user_id, recipe_id):
+    """Рецепт попал в корзину: его ингредиенты добавляются к списку"""
+    change_items([user_id], recipe_amounts(recipe_id))
+
+
+def remove_from_shopping_list(user_id, recipe_id):
+    """Рецепт убран из корзины: его ингредиенты вычитаются из списка"""
+    change_items([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in recipe_amounts(recipe_id).items()
+    })
+
+
+def change_shopping_list(user_id, recipe_ids, sign):
+    """Рецепты пачкой добавлены (sign=1) или убраны (sign=-1) из корзины"""
+    change_items([user_id], {
+        ingredient_id: sign * total
+        for ingredient_id, total in AmountIngredients.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values("ingredients_id").annotate(
+            total=Sum("amount")
+        ).order_by().values_list("ingredients_id", "total")
+    })
+
+
+def change_recipe_amounts(recipe_id, deltas):
+    """Ингредиенты рецепта изменились: правит списки его покупателей"""
+    change_items(cart_users(recipe_id), deltas)
+
+
+def rebuild_shopping_lists(user_ids=None):
+    """Пересобирает сводные списки покупок с нуля, возвращает число строк"""
+    items = ShoppingListItem.objects.all()
+    carts = ShoppingList.objects.filter(
+        recipe__ingredients_list__ingredients__isnull=False
+    )
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+        carts = carts.filter(user_id__in=user_ids)
+    items.delete()
+    totals = carts.values(
+        "user_id", "recipe__ingredients_list__ingredients_id"
+    ).annotate(
+        total=Sum("recipe__ingredients_list__amount")
+    ).order_by()
+    rows = (
+        ShoppingListItem(
+            user_id=row["user_id"],
+            ingredients_id=row["recipe__ingredients_list__ingredients_id"],
+            amount=row["total"],
+        )
+        for row in totals.iterator()
+    )
+    total = 0
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            return total
+        ShoppingListItem.objects.bulk_create(batch)
+        total += len(batch)
@@ -0,0 +1,178 @@
+from django.db.models import Q
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from recipes.background import run_after_commit
+from recipes.catalog import INGREDIENTS, TAGS, bump_catalog_version
+from recipes.cookable import record_recipe_changes
+from recipes.counters import change_counter
+from recipes.feed import fan_out
+from recipes.fragments import invalidate_recipe_fragment
+from recipes.models import (AmountIngredients, Favorite, FeedItem, Ingredients,
+                            Recipes, ShoppingList, Tags, TagsRecipes)
+from recipes.relations import RELATION_KINDS, invalidate_relations
+from recipes.search import refresh_search_documents
+from recipes.shopping import (add_to_shopping_list, change_recipe_amounts,
+                              remove_from_shopping_list)
+from recipes.similar import mark_stale
+from users.models import CustomUser
+
+
+CATALOGS = {
+    Tags: TAGS,
+    Ingredients: INGREDIENTS,
+}
+
+RECIPE_COUNTERS = {
+    Favorite: "favorites_count",
+    ShoppingList: "shopping_carts_count",
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+def relation_created(sender, instance, created, raw, **kwargs):
+    invalidate_relations(instance.user_id, RELATION_KINDS[sender])
+    if created and not raw:
+        change_counter(
+            Recipes, instance.recipe_id, RECIPE_COUNTERS[sender], 1)
+        mark_stale([instance.recipe_id])
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingList)
+def relation_deleted(sender, instance, **kwargs):
+    invalidate_relations(instance.user_id, RELATION_KINDS[sender])
+    change_counter(Recipes, instance.recipe_id, RECIPE_COUNTERS[sender], -1)
+    mark_stale([instance.recipe_id])
+
+
+@receiver(post_save, sender=ShoppingList)
+def cart_recipe_added(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        add_to_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingList)
+def cart_recipe_removed(sender, instance, **kwargs):
+    remove_from_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_save, sender=AmountIngredients)
+def recipe_amount_saving(sender, instance, raw, **kwargs):
+    instance._old_amount = None
+    if raw or instance.pk is None:
+        return
+    instance._old_amount = AmountIngredients.objects.filter(
+        pk=instance.pk).values_list("recipe_id", "ingredients_id",
+                                    "amount").first()
+
+
+@receiver(post_save, sender=AmountIngredients)
+def recipe_amount_saved(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    changes = {}
+    old = getattr(instance, "_old_amount", None)
+    if old is not None:
+        recipe_id, ingredient_id, amount = old
+        changes[recipe_id] = {ingredient_id: -amount}
+    deltas = changes.setdefault(instance.recipe_id, {})
+    deltas[instance.ingredients_id] = (
+        deltas.get(instance.ingredients_id, 0) + instance.amount
+    )
+    for recipe_id, deltas in changes.items():
+        change_recipe_amounts(recipe_id, deltas)
+
+
+@receiver(post_delete, sender=AmountIngredients)
+def recipe_amount_deleted(sender, instance, **kwargs):
+    change_recipe_amounts(
+        instance.recipe_id, {instance.ingredients_id: -instance.amount})
+
+
+@receiver(pre_save, sender=Recipes)
+def recipe_author_changed(sender, instance, raw, **kwargs):
+    if raw or instance.pk is None:
+        return
+    old_author_id = Recipes.objects.filter(
+        pk=instance.pk).values_list("author_id", flat=True).first()
+    if old_author_id != instance.author_id:
+        change_counter(CustomUser, old_author_id, "recipes_count", -1)
+        change_counter(CustomUser, instance.author_id, "recipes_count", 1)
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(CustomUser, instance.author_id, "recipes_count", 1)
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_published(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        # Рассылка подписчикам не задерживает ответ автору
+        run_after_commit(fan_out, instance.pk)
+        return
+    FeedItem.objects.filter(recipe=instance).filter(
+        ~Q(published=instance.published) | ~Q(author_id=instance.author_id)
+    ).update(published=instance.published, author_id=instance.author_id)
+
+
+@receiver(post_delete, sender=Recipes)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(CustomUser, instance.author_id, "recipes_count", -1)
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_delete, sender=Recipes)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipe_fragment(instance.pk)
+
+
+@receiver(post_save, sender=AmountIngredients)
+@receiver(post_delete, sender=AmountIngredients)
+@receiver(post_save, sender=TagsRecipes)
+@receiver(post_delete, sender=TagsRecipes)
+def recipe_part_changed(sender, instance, **kwargs):
+    invalidate_recipe_fragment(instance.recipe_id)
+
+
+@receiver(post_save, sender=AmountIngredients)
+@receiver(post_delete, sender=AmountIngredients)
+def recipe_ingredients_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_recipe_changes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=TagsRecipes)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        invalidate_recipe_fragment(instance.pk)
+        return
+    if pk_set is None:
+        pk_set = instance.recipes.values_list("pk", flat=True)
+    for recipe_id in pk_set:
+        invalidate_recipe_fragment(recipe_id)
+
+
+@receiver(post_save, sender=Tags)
+@receiver(post_delete, sender=Tags)
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_version(CATALOGS[sender])
+
+
+@receiver(post_save, sender=Ingredients)
+def ingredient_renamed(sender, instance, created, raw, **kwargs):
+    if created or raw:
+        return
+    refresh_search_documents(Recipes.objects.filter(
+        ingredients_list__ingredients=instance
+    ).values_list("pk", flat=True))
@@ -0,0 +1,163 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from recipes.models import Favorite, Recipes, ShoppingList, SimilarRecipe
+
+INTERACTIONS = (Favorite, ShoppingList)
+CHUNK_SIZE = 500
+
+
+def mark_stale(recipe_ids):
+    """Похожие рецепты пересчитаются при следующем запуске"""
+    Recipes.objects.filter(pk__in=recipe_ids, similar_stale=False).update(
+        similar_stale=True
+    )
+
+
+def chunked(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def recipe_users(recipe_ids):
+    """Последние пользователи, добавившие рецепт в избранное или корзину"""
+    users = defaultdict(set)
+    for recipe_id in recipe_ids:
+        for model in INTERACTIONS:
+            users[recipe_id].update(model.objects.filter(
+                recipe_id=recipe_id
+            ).order_by("-pk").values_list(
+                "user_id", flat=True
+            )[:settings.SIMILAR_RECIPES_MAX_USERS])
+    return users
+
+
+def user_recipes(user_ids):
+    recipes = defaultdict(set)
+    for chunk in chunked(user_ids):
+        for model in INTERACTIONS:
+            for user_id, recipe_id in model.objects.filter(
+                user_id__in=chunk
+            ).values_list("user_id", "recipe_id"):
+                recipes[user_id].add(recipe_id)
+    return recipes
+
+
+def popularity(recipe_ids):
+    """Число добавлений рецепта: норма его вектора по пользователям"""
+    counts = {}
+    for chunk in chunked(recipe_ids):
+        for pk, favorites, carts in Recipes.objects.filter(
+            pk__in=chunk
+        ).values_list("pk", "favorites_count", "shopping_carts_count"):
+            counts[pk] = favorites + carts
+    return counts
+
+
+def compute_scores(recipe_ids):
+    """Косинусное сходство рецептов пачки со всеми, с кем они совпадали"""
+    users = recipe_users(recipe_ids)
+    recipes = user_recipes(set().union(*users.values()))
+    common = {}
+    for recipe_id in recipe_ids:
+        counter = Counter()
+        for user_id in users[recipe_id]:
+            counter.update(recipes[user_id])
+        counter.pop(recipe_id, None)
+        common[recipe_id] = {
+            other_id: count for other_id, count in counter.items()
+            if count >= settings.SIMILAR_RECIPES_MIN_COMMON
+        }
+    counts = popularity(set(recipe_ids).union(*common.values()))
+    return {
+        recipe_id: {
+            other_id: count / math.sqrt(
+                max(counts.get(recipe_id, 0), 1)
+                * max(counts.get(other_id, 0), 1)
+            )
+            for other_id, count in scores.items()
+        }
+        for recipe_id, scores in common.items()
+    }
+
+
+def top(scores):
+    return dict(heapq.nlargest(
+        settings.SIMILAR_RECIPES_LIMIT, scores.items(),
+        key=lambda item: (item[1], -item[0]),
+    ))
+
+
+def refresh_similar(recipe_ids):
+    """Пересчитывает похожие рецепты пачки и обновляет списки соседей.
+
+    Сходство симметрично, поэтому новая оценка пары записывается и
+    в список соседа: туда, где пачка уже была, и туда, куда она
+    попала в топ. Остальные соседи уточнятся при своём пересчёте.
+    """
+    with transaction.atomic():
+        Recipes.objects.filter(pk__in=recipe_ids).update(
+            similar_stale=False
+        )
+        scores = compute_scores(recipe_ids)
+        lists = {recipe_id: top(scores[recipe_id]) for recipe_id in scores}
+        neighbours = set(SimilarRecipe.objects.filter(
+            similar_id__in=recipe_ids
+        ).values_list("recipe_id", flat=True))
+        neighbours.update(*lists.values())
+        neighbours.difference_update(recipe_ids)
+        stored = defaultdict(dict)
+        for chunk in chunked(neighbours):
+            for recipe_id, similar_id, score in SimilarRecipe.objects.filter(
+                recipe_id__in=chunk
+            ).values_list("recipe_id", "similar_id", "score"):
+                stored[recipe_id][similar_id] = score
+        for neighbour_id in neighbours:
+            merged = stored[neighbour_id]
+            for recipe_id in recipe_ids:
+                score = scores[recipe_id].get(neighbour_id)
+                if score is None:
+                    merged.pop(recipe_id, None)
+                else:
+                    merged[recipe_id] = score
+            lists[neighbour_id] = top(merged)
+        for chunk in chunked(lists):
+            SimilarRecipe.objects.filter(recipe_id__in=chunk).delete()
+        SimilarRecipe.objects.bulk_create(
+            [
+                SimilarRecipe(
+                    recipe_id=recipe_id, similar_id=similar_id, score=score
+                )
+                for recipe_id, similar in lists.items()
+                for similar_id, score in similar.items()
+            ],
+            batch_size=CHUNK_SIZE,
+        )
+    return len(recipe_ids)
+
+
+def refresh_stale_similar(batch_size=None):
+    """Пересчитывает рецепты, у которых менялось избранное или корзина"""
+    batch_size = batch_size or settings.SIMILAR_RECIPES_BATCH_SIZE
+    stale = Recipes.objects.filter(similar_stale=True).order_by("pk")
+    total, last_pk = 0, 0
+    while True:
+        batch = list(stale.filter(pk__gt=last_pk).values_list(
+            "pk", flat=True)[:batch_size])
+        if not batch:
+            return total
+        total += refresh_similar(batch)
+        last_pk = batch[-1]
+
+
+def get_similar(recipe_id, limit):
+    return list(SimilarRecipe.objects.filter(
+        recipe_id=recipe_id
+    ).order_by("-score", "similar_id").values_list(
+        "similar_id", flat=True
+    )[:limit])
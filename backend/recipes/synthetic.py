@@ -0,0 +1,298 @@
+import base64
+import io
+import multiprocessing
+import random
+import re
+from collections import namedtuple
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Case, DateTimeField, Max, Value, When
+from django.utils import timezone
+
+from recipes.cookable import reset_cookable_index
+from recipes.feed import rebuild_feeds
+from recipes.models import (AmountIngredients, Favorite, Ingredients, Recipes,
+                            ShoppingList, Tags, TagsRecipes)
+from recipes.shopping import rebuild_shopping_lists
+from recipes.similar import refresh_stale_similar
+from users.models import CustomUser, Follow
+
+BATCH_SIZE = 1000
+PASSWORD = "synthetic-password"
+IMAGE_NAME = "recipes/images/synthetic.png"
+# Готовый PNG 1x1: картинку не нужно ни рисовать, ни декодировать
+PLACEHOLDER_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAADElEQVR4nGP4"
+    "//8/AAX+Av4N70a4AAAAAElFTkSuQmCC"
+)
+ZIPF_EXPONENT = 1.1
+
+Scale = namedtuple(
+    "Scale",
+    ("users", "recipes", "ingredients_per_recipe", "follows", "favorites",
+     "carts"),
+)
+
+# Общие для процессов данные: задаются до fork и наследуются воркерами
+_shared = {}
+
+
+class ZipfSampler:
+    """Выбор элементов с вероятностью, обратной степени их ранга"""
+
+    def __init__(self, items, exponent, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(self.items) + 1)
+        ))
+
+    def choice(self, rng):
+        return rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+    def sample(self, rng, count):
+        """До count разных элементов, популярные выпадают чаще"""
+        if not self.items or count <= 0:
+            return set()
+        return set(rng.choices(
+            self.items, cum_weights=self.cum_weights, k=count))
+
+
+def bulk_insert(model, objects, batch_size=BATCH_SIZE):
+    """Вставляет объекты из генератора пачками, не держа их в памяти"""
+    objects = iter(objects)
+    total = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return total
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+        total += len(batch)
+
+
+def ensure_placeholder_image():
+    if not default_storage.exists(IMAGE_NAME):
+        default_storage.save(IMAGE_NAME, ContentFile(PLACEHOLDER_PNG))
+
+
+def numbered_ids(queryset, field, prefix):
+    """id строк в порядке номера в field, а не в порядке вставки.
+
+    Берутся только значения вида <prefix><номер>: настоящий
+    пользователь synthetic_foo номером не считается.
+    """
+    rows = queryset.filter(
+        **{f"{field}__regex": rf"^{re.escape(prefix)}[0-9]+( |$)"}
+    ).values_list("pk", field)
+    return [
+        pk for _, pk in sorted(
+            (int(value[len(prefix):].split()[0]), pk) for pk, value in rows
+        )
+    ]
+
+
+def create_users(rng, start, stop):
+    password = _shared["password"]
+    prefix = _shared["prefix"]
+    return bulk_insert(CustomUser, (
+        CustomUser(
+            email=f"{prefix}{number}@example.com",
+            username=f"{prefix}{number}",
+            first_name=f"Имя{number}",
+            last_name=f"Фамилия{number}",
+            password=password,
+        )
+        for number in range(start, stop)
+    ))
+
+
+def create_recipes(rng, start, stop):
+    authors = _shared["authors"]
+    prefix = _shared["prefix"]
+    now = _shared["now"]
+    published = {}
+    for number in range(start, stop):
+        published[f"{prefix}{number} рецепт"] = now - timedelta(
+            minutes=rng.randint(0, 525600))
+    total = bulk_insert(Recipes, (
+        Recipes(
+            author_id=authors.choice(rng),
+            name=name,
+            text=f"Описание рецепта {number}",
+            cooking_time=rng.randint(1, 180),
+            image=IMAGE_NAME,
+        )
+        for number, name in enumerate(published, start)
+    ))
+    # auto_now_add ставит всем рецептам время вставки: дата публикации
+    # выставляется после неё одним UPDATE на пачку
+    Recipes.objects.filter(
+        pk__gt=_shared["last_recipe_id"], name__in=published
+    ).update(published=Case(
+        *(When(name=name, then=Value(value))
+          for name, value in published.items()),
+        output_field=DateTimeField(),
+    ))
+    return total
+
+
+def create_recipe_parts(rng, recipe_ids):
+    ingredients = _shared["ingredients"]
+    tag_ids = _shared["tag_ids"]
+    per_recipe = _shared["scale"].ingredients_per_recipe
+    total = bulk_insert(AmountIngredients, (
+        AmountIngredients(
+            recipe_id=recipe_id, ingredients_id=ingredient_id,
+            amount=rng.randint(1, 500)
+        )
+        for recipe_id in recipe_ids
+        for ingredient_id in ingredients.sample(rng, per_recipe)
+    ))
+    if tag_ids:
+        total += bulk_insert(TagsRecipes, (
+            TagsRecipes(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(
+                tag_ids, rng.randint(1, min(3, len(tag_ids))))
+        ))
+    return total
+
+
+def create_relations(rng, user_ids):
+    scale = _shared["scale"]
+    authors = _shared["authors"]
+    recipes = _shared["recipes"]
+    total = 0
+    for model, field, sampler, average in (
+        (Follow, "author_id", authors, scale.follows),
+        (Favorite, "recipe_id", recipes, scale.favorites),
+        (ShoppingList, "recipe_id", recipes, scale.carts),
+    ):
+        total += bulk_insert(model, (
+            model(user_id=user_id, **{field: target_id})
+            for user_id in user_ids
+            for target_id in sampler.sample(
+                rng, rng.randint(0, average * 2))
+            if model is not Follow or target_id != user_id
+        ))
+    return total
+
+
+TASKS = {
+    "users": create_users,
+    "recipes": create_recipes,
+    "parts": create_recipe_parts,
+    "relations": create_relations,
+}
+
+
+def run_task(task):
+    """Выполняет пачку; её rng зависит только от seed и номера пачки"""
+    kind, index, args = task
+    rng = random.Random(f"{_shared['seed']}:{kind}:{index}")
+    try:
+        return TASKS[kind](rng, *args)
+    finally:
+        if _shared["workers"] > 1:
+            connections.close_all()
+
+
+def run_tasks(tasks, workers):
+    if workers == 1:
+        return sum(map(run_task, tasks))
+    connections.close_all()
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        return sum(pool.imap_unordered(run_task, tasks))
+
+
+def ranges(total, size):
+    return [
+        (index, (start, min(start + size, total)))
+        for index, start in enumerate(range(0, total, size))
+    ]
+
+
+def chunks(items, size):
+    return [
+        (index, (items[start:start + size],))
+        for index, start in enumerate(range(0, len(items), size))
+    ]
+
+
+def refresh_derived(user_ids):
+    """Пересчитывает то, что сигналы не видят при bulk_create"""
+    output = io.StringIO()
+    call_command("recount_counters", stdout=output)
+    call_command("rebuild_search_index", stdout=output)
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        rebuild_shopping_lists(user_ids[start:start + BATCH_SIZE])
+    rebuild_feeds(user_ids)
+    refresh_stale_similar()
+    reset_cookable_index()
+
+
+def generate(scale, seed=0, prefix="synthetic_", workers=1,
+             batch_size=BATCH_SIZE, exponent=ZIPF_EXPONENT, derived=True,
+             log=None):
+    """Создаёт пользователей, рецепты и связи между ними.
+
+    Авторы, ингредиенты и рецепты выбираются по закону Ципфа, так что
+    у немногих авторов и рецептов большинство подписчиков и избранного.
+    Результат зависит только от seed, а не от числа процессов.
+    Справочники ингредиентов и тегов должны быть уже загружены
+    (add_data). Возвращает id созданных пользователей и рецептов.
+    """
+    if connection.vendor == "sqlite":
+        workers = 1
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    ensure_placeholder_image()
+    _shared.update(
+        seed=seed, prefix=prefix, scale=scale, workers=workers,
+        now=timezone.now(), password=make_password(PASSWORD),
+        # Рецепты прошлых запусков с тем же префиксом не трогаются
+        last_recipe_id=Recipes.objects.aggregate(
+            last=Max("pk"))["last"] or 0,
+        tag_ids=sorted(Tags.objects.values_list("pk", flat=True)),
+        ingredients=ZipfSampler(sorted(
+            Ingredients.objects.values_list("pk", flat=True)
+        ), exponent, rng),
+    )
+
+    total = run_tasks(
+        [("users", *task) for task in ranges(scale.users, batch_size)],
+        workers
+    )
+    user_ids = numbered_ids(CustomUser.objects, "username", prefix)
+    log(f"Пользователи: {total}")
+    _shared["authors"] = ZipfSampler(user_ids, exponent, rng)
+
+    total = run_tasks(
+        [("recipes", *task) for task in ranges(scale.recipes, batch_size)],
+        workers
+    )
+    recipe_ids = numbered_ids(Recipes.objects.filter(
+        pk__gt=_shared["last_recipe_id"]), "name", prefix)
+    log(f"Рецепты: {total}")
+    _shared["recipes"] = ZipfSampler(recipe_ids, exponent, rng)
+
+    per_recipe = max(1, scale.ingredients_per_recipe + 2)
+    per_user = max(1, 2 * (scale.follows + scale.favorites + scale.carts))
+    total = run_tasks(
+        [("parts", *task)
+         for task in chunks(recipe_ids, max(1, batch_size // per_recipe))]
+        + [("relations", *task)
+           for task in chunks(user_ids, max(1, batch_size // per_user))],
+        workers
+    )
+    log(f"Ингредиенты, теги и связи: {total}")
+    if derived:
+        refresh_derived(user_ids)
+        log("Производные данные пересчитаны")
+    return user_ids, recipe_ids
@@ -0,0 +1,101 @@
+from collections import namedtuple
+
+from recipes.search import normalize
+
+MASS = "mass"
+VOLUME = "volume"
+
+Unit = namedtuple("Unit", ("dimension", "factor"))
+
+# Единицы из data/ingredients.csv, которые переводятся друг в друга.
+# factor - сколько базовых единиц измерения (г или мл) в одной единице.
+UNITS = {
+    "г": Unit(MASS, 1),
+    "кг": Unit(MASS, 1000),
+    "мл": Unit(VOLUME, 1),
+    "л": Unit(VOLUME, 1000),
+    "капля": Unit(VOLUME, 0.05),
+    "ч. л.": Unit(VOLUME, 5),
+    "ст. л.": Unit(VOLUME, 15),
+    "стакан": Unit(VOLUME, 250),
+}
+BASE_UNITS = {
+    MASS: "г",
+    VOLUME: "мл",
+}
+LARGE_UNITS = {
+    MASS: "кг",
+    VOLUME: "л",
+}
+ALIASES = {
+    "гр": "г",
+    "гр.": "г",
+    "г.": "г",
+    "грамм": "г",
+    "кг.": "кг",
+    "мл.": "мл",
+    "л.": "л",
+    "литр": "л",
+    "ч.л.": "ч. л.",
+    "чайная ложка": "ч. л.",
+    "ст.л.": "ст. л.",
+    "столовая ложка": "ст. л.",
+    "шт": "шт.",
+    "штука": "шт.",
+}
+
+
+def normalize_unit(unit):
+    unit = " ".join((unit or "").casefold().split())
+    return ALIASES.get(unit, unit)
+
+
+def round_amount(amount):
+    amount = round(amount, 2)
+    return int(amount) if amount == int(amount) else amount
+
+
+def to_display(dimension, amount):
+    """Базовая единица или крупная, если набралась хотя бы одна"""
+    large = LARGE_UNITS[dimension]
+    if amount >= UNITS[large].factor:
+        return large, amount / UNITS[large].factor
+    return BASE_UNITS[dimension], amount
+
+
+def merge_units(rows, name_field="ingredients__name",
+                unit_field="ingredients__measurement_unit",
+                amount_field="amount"):
+    """Сводит строки списка покупок за один проход.
+
+    Одинаковые после нормализации названия складываются, если их
+    единицы переводятся друг в друга (г и кг, мл и ложки). Остальные
+    единицы (шт., по вкусу, пучок) складываются только сами с собой.
+    """
+    totals = {}
+    names = {}
+    for row in rows:
+        name = normalize(row[name_field])
+        unit = normalize_unit(row[unit_field])
+        amount = row[amount_field]
+        spec = UNITS.get(unit)
+        if spec is None:
+            key = (name, None, unit)
+        else:
+            key = (name, spec.dimension, None)
+            amount *= spec.factor
+        totals[key] = totals.get(key, 0) + amount
+        names.setdefault(key, row[name_field])
+    merged = []
+    for key, amount in totals.items():
+        _, dimension, unit = key
+        if dimension is not None:
+            unit, amount = to_display(dimension, amount)
+        merged.append({
+            name_field: names[key],
+            unit_field: unit,
+            amount_field: round_amount(amount),
+        })
+    merged.sort(key=lambda item: (normalize(item[name_field]),
+                                  item[unit_field]))
+    return merged
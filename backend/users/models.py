@@ -7,6 +7,16 @@ class CustomUser(AbstractUser):
     """Модель Пользователя"""
     email = models.EmailField("email address", blank=True, unique=True)
     USERNAME_FIELD = "email"
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число_рецептов",
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число_подписчиков",
+    )
     REQUIRED_FIELDS = ("username", "first_name", "last_name")
 
     class Meta:
@@ -2,10 +2,34 @@ from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
 from recipes.models import Recipes
+from recipes.relations import FOLLOWING, get_user_relations
 
 from .models import CustomUser, Follow
 
 
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не задан"""
+    if request is None:
+        return None
+    try:
+        limit = int(request.query_params.get("recipes_limit"))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def get_author_recipes(author, request):
+    """Последние рецепты автора с учётом recipes_limit"""
+    recipes = getattr(author, "latest_recipes", None)
+    if recipes is not None:
+        return recipes
+    recipes = author.recipes.order_by("-published", "-id")
+    limit = get_recipes_limit(request)
+    if limit is not None:
+        recipes = recipes[:limit]
+    return recipes
+
+
 class CurrentUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -24,7 +48,7 @@ class CurrentUserSerializer(UserSerializer):
         request = self.context.get("request")
         if not request.user.is_authenticated:
             return False
-        return Follow.objects.filter(user=request.user, author=obj).exists()
+        return get_user_relations(request).contains(FOLLOWING, obj.id)
 
 
 class SupportRecipesSerializer(serializers.ModelSerializer):
@@ -51,15 +75,15 @@ class SubscribeListSerializer(serializers.ModelSerializer):
                   'is_subscribed', 'recipes', 'recipes_count')
 
     def get_recipes(self, obj):
-        recipes = Recipes.objects.filter(author=obj.author)
+        recipes = get_author_recipes(obj.author, self.context.get("request"))
         return SupportRecipesSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
-        recipes = Recipes.objects.filter(author=obj.author)
-        return recipes.count()
+        return obj.author.recipes_count
 
     def get_is_subscribed(self, obj):
-        return CurrentUserSerializer.get_is_subscribed(self, obj.author)
+        request = self.context.get("request")
+        return obj.user_id == request.user.id
 
     # def __check_user_authorized(self, obj):
     #     request = self.context.get('request')
@@ -85,13 +109,12 @@ class SubscribeSerializer(serializers.ModelSerializer):
                   'recipes', 'recipes_count')
 
     def get_recipes(self, obj):
-        recipes = Recipes.objects.filter(author_id=obj.id)
+        recipes = get_author_recipes(obj, self.context.get("request"))
         serializer = SupportRecipesSerializer(recipes, many=True)
         return serializer.data
 
     def get_recipes_count(self, obj):
-        recipes = Recipes.objects.filter(author_id=obj.id)
-        return recipes.count()
+        return obj.recipes_count
 
     def get_is_subscribed(self, obj):
         return True
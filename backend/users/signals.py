@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from recipes.feed import backfill, remove_authors
+from recipes.fragments import invalidate_author_fragments
+from recipes.relations import FOLLOWING, invalidate_relations
+from users.models import CustomUser, Follow
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw, **kwargs):
+    invalidate_relations(instance.user_id, FOLLOWING)
+    if created and not raw:
+        change_counter(CustomUser, instance.author_id, "followers_count", 1)
+        backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    invalidate_relations(instance.user_id, FOLLOWING)
+    change_counter(CustomUser, instance.author_id, "followers_count", -1)
+    remove_authors(instance.user_id, [instance.author_id])
+
+
+@receiver(post_save, sender=CustomUser)
+def author_changed(sender, instance, **kwargs):
+    invalidate_author_fragments(instance.pk)
@@ -0,0 +1,92 @@
+import io
+
+import pytest
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.models import AmountIngredients, Ingredients, Recipes, Tags
+from users.models import CustomUser
+
+
+def png_file(name="recipe.png"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), (200, 10, 10)).save(buffer, "PNG")
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+@pytest.fixture(autouse=True)
+def media_and_cache(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.BACKGROUND_EXECUTOR = "sync"
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    def make(username):
+        return CustomUser.objects.create_user(
+            email=f"{username}@example.com", username=username,
+            password="Pass-12345", first_name=username, last_name=username,
+        )
+    return make
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user("author")
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user("user")
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tags.objects.create(name=f"Тег {i}", color=f"#00000{i}", slug=f"tag{i}")
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredients.objects.create(name=f"Ингредиент {i}", measurement_unit="г")
+        for i in range(5)
+    ]
+
+
+@pytest.fixture
+def make_recipe(tags, ingredients):
+    def make(author, name="Рецепт"):
+        recipe = Recipes.objects.create(
+            author=author, name=name, text="Описание", cooking_time=10,
+            image=png_file(),
+        )
+        recipe.tags.set(tags)
+        AmountIngredients.objects.bulk_create([
+            AmountIngredients(recipe=recipe, ingredients=ingredient, amount=i + 1)
+            for i, ingredient in enumerate(ingredients)
+        ])
+        return recipe
+    return make
+
+
+@pytest.fixture
+def recipe(author, make_recipe):
+    return make_recipe(author)
+
+
+@pytest.fixture
+def client_for():
+    def make(user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+    return make
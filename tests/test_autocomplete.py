@@ -0,0 +1,86 @@
+import pytest
+
+from recipes.autocomplete import IngredientIndex
+from recipes.models import Ingredients
+
+NAMES = [
+    "Сахар", "сахарная пудра", "Тростниковый сахар", "Ёжевика",
+    "свёкла", "Свекольный сок", "Молоко", "Сгущённое молоко",
+]
+
+
+@pytest.fixture
+def catalog(db):
+    return {
+        name: Ingredients.objects.create(name=name, measurement_unit="г")
+        for name in NAMES
+    }
+
+
+@pytest.fixture
+def commit(django_capture_on_commit_callbacks):
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+def names(rows):
+    return [row["name"] for row in rows]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("сах", ["Сахар", "сахарная пудра", "Тростниковый сахар"]),
+    ("САХАР", ["Сахар", "сахарная пудра", "Тростниковый сахар"]),
+    ("молоко", ["Молоко", "Сгущённое молоко"]),
+    ("ежев", ["Ёжевика"]),
+    ("ёжев", ["Ёжевика"]),
+    ("свек", ["свёкла", "Свекольный сок"]),
+    ("сгущен", ["Сгущённое молоко"]),
+    ("  сахарная   пудра ", ["сахарная пудра"]),
+    ("квас", []),
+])
+def test_prefix_before_substring(catalog, query, expected):
+    assert names(IngredientIndex().search(query)) == expected
+
+
+def test_limit_counts_prefix_and_substring(catalog):
+    index = IngredientIndex()
+    assert names(index.search("сах", limit=2)) == ["Сахар", "сахарная пудра"]
+    assert names(index.search("а", limit=3)) == names(index.search("а"))[:3]
+    assert len(index.search("", limit=5)) == 5
+
+
+def test_rows_have_api_fields(catalog):
+    assert IngredientIndex().search("ёжевика") == [{
+        "id": catalog["Ёжевика"].id,
+        "name": "Ёжевика",
+        "measurement_unit": "г",
+    }]
+
+
+def test_catalog_changes_rebuild_index(catalog, commit):
+    index = IngredientIndex()
+    assert names(index.search("мед")) == []
+    with commit():
+        Ingredients.objects.create(name="Мёд", measurement_unit="г")
+    assert names(index.search("мед")) == ["Мёд"]
+    sugar = catalog["Сахар"]
+    sugar.name = "Сахар-рафинад"
+    with commit():
+        sugar.save()
+    assert names(index.search("рафинад")) == ["Сахар-рафинад"]
+    with commit():
+        catalog["Молоко"].delete()
+    assert names(index.search("молоко")) == ["Сгущённое молоко"]
+
+
+def test_index_is_kept_without_changes(catalog, django_assert_num_queries):
+    index = IngredientIndex()
+    index.search("сах")
+    with django_assert_num_queries(0):
+        index.search("мол")
+
+
+def test_api_autocomplete(catalog, client_for):
+    response = client_for().get("/api/ingredients/", {"name": "сах"})
+    assert response.status_code == 200
+    assert names(response.json()) == [
+        "Сахар", "сахарная пудра", "Тростниковый сахар"]
@@ -0,0 +1,105 @@
+import pytest
+
+from recipes.models import FeedItem, ShoppingListItem
+from recipes.shopping import rebuild_shopping_lists
+
+MISSING_ID = 999999
+
+
+@pytest.fixture
+def recipes(author, make_recipe):
+    return [make_recipe(author, name=f"Рецепт {i}") for i in range(3)]
+
+
+def statuses(response):
+    assert response.status_code == 200, response.content
+    return {item["id"]: item["status"] for item in response.json()["results"]}
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        "ingredients_id", "amount"))
+
+
+@pytest.mark.parametrize("relation, field", [
+    ("favorite", "favorites_count"),
+    ("shopping_cart", "shopping_carts_count"),
+])
+def test_recipe_batch_statuses(user, recipes, client_for, relation, field):
+    client = client_for(user)
+    url = f"/api/recipes/{relation}/batch/"
+    first, second, third = recipes
+    assert statuses(client.post(url, {"ids": [first.id]}, format="json")) == {
+        first.id: "created"}
+    assert statuses(client.post(url, {
+        "ids": [first.id, second.id, MISSING_ID]
+    }, format="json")) == {
+        first.id: "exists", second.id: "created", MISSING_ID: "not_found"}
+    for recipe, count in ((first, 1), (second, 1), (third, 0)):
+        recipe.refresh_from_db()
+        assert getattr(recipe, field) == count
+    assert statuses(client.delete(url, {
+        "ids": [first.id, third.id, MISSING_ID]
+    }, format="json")) == {
+        first.id: "deleted", third.id: "missing", MISSING_ID: "not_found"}
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert getattr(first, field) == 0
+    assert getattr(second, field) == 1
+
+
+def test_shopping_cart_batch_updates_shopping_list(user, recipes,
+                                                   client_for):
+    client = client_for(user)
+    url = "/api/recipes/shopping_cart/batch/"
+    ids = [recipe.id for recipe in recipes]
+    client.post(url, {"ids": ids}, format="json")
+    items = shopping_list(user)
+    assert sorted(items.values()) == [3, 6, 9, 12, 15]
+    rebuild_shopping_lists([user.id])
+    assert shopping_list(user) == items
+    client.delete(url, {"ids": ids[:2]}, format="json")
+    assert sorted(shopping_list(user).values()) == [1, 2, 3, 4, 5]
+    client.delete(url, {"ids": ids}, format="json")
+    assert shopping_list(user) == {}
+
+
+def test_subscribe_batch(user, author, make_user, recipes, client_for):
+    other = make_user("other")
+    client = client_for(user)
+    url = "/api/users/subscribe/batch/"
+    assert statuses(client.post(url, {
+        "ids": [author.id, other.id, user.id, MISSING_ID]
+    }, format="json")) == {
+        author.id: "created", other.id: "created",
+        user.id: "not_found", MISSING_ID: "not_found"}
+    author.refresh_from_db()
+    assert author.followers_count == 1
+    assert set(FeedItem.objects.filter(user=user).values_list(
+        "recipe_id", flat=True)) == {recipe.id for recipe in recipes}
+    assert statuses(client.post(url, {"ids": [author.id]}, format="json")) == {
+        author.id: "exists"}
+    assert statuses(client.delete(url, {
+        "ids": [author.id, user.id]
+    }, format="json")) == {author.id: "deleted", user.id: "not_found"}
+    author.refresh_from_db()
+    assert author.followers_count == 0
+    assert not FeedItem.objects.filter(user=user).exists()
+    assert statuses(client.delete(url, {"ids": [author.id]}, format="json")) == {
+        author.id: "missing"}
+
+
+@pytest.mark.parametrize("url", [
+    "/api/recipes/favorite/batch/",
+    "/api/recipes/shopping_cart/batch/",
+    "/api/users/subscribe/batch/",
+])
+def test_batch_limit(user, client_for, settings, url):
+    client = client_for(user)
+    limit = settings.BATCH_RELATIONS_LIMIT
+    too_many = list(range(1, limit + 2))
+    assert client.post(url, {"ids": too_many}, format="json").status_code == 400
+    assert client.post(url, {"ids": []}, format="json").status_code == 400
+    response = client.post(url, {"ids": too_many[:limit]}, format="json")
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == limit
@@ -0,0 +1,73 @@
+import pytest
+from django.core.cache import cache
+
+from recipes.models import Tags
+
+
+@pytest.fixture
+def commit(django_capture_on_commit_callbacks):
+    """Версия справочника меняется только после фиксации транзакции"""
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+def test_conditional_get(tags, client_for):
+    client = client_for()
+    response = client.get("/api/tags/")
+    assert response.status_code == 200
+    etag = response["ETag"]
+    assert "public" in response["Cache-Control"]
+    not_modified = client.get("/api/tags/", HTTP_IF_NONE_MATCH=etag)
+    assert not_modified.status_code == 304
+    assert not_modified["ETag"] == etag
+    since = client.get(
+        "/api/tags/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+    assert since.status_code == 304
+
+
+def test_write_invalidates_cache_and_etag(tags, client_for, commit):
+    client = client_for()
+    response = client.get("/api/tags/")
+    assert len(response.json()) == len(tags)
+    with commit():
+        Tags.objects.create(name="Новый тег", color="#123456", slug="new")
+    fresh = client.get("/api/tags/", HTTP_IF_NONE_MATCH=response["ETag"])
+    assert fresh.status_code == 200
+    assert fresh["ETag"] != response["ETag"]
+    assert len(fresh.json()) == len(tags) + 1
+
+
+def test_ingredient_rename_invalidates_detail(ingredients, client_for,
+                                              commit):
+    client = client_for()
+    ingredient = ingredients[0]
+    url = f"/api/ingredients/{ingredient.id}/"
+    etag = client.get(url)["ETag"]
+    ingredient.name = "Переименованный"
+    with commit():
+        ingredient.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()["name"] == "Переименованный"
+
+
+def test_unknown_params_share_cache_entry(ingredients, client_for):
+    """Число записей видно только у LocMemCache, он и стоит по умолчанию"""
+    client = client_for()
+    etag = client.get("/api/ingredients/")["ETag"]
+    keys = set(cache._cache)
+    for value in range(5):
+        response = client.get(f"/api/ingredients/?junk={value}")
+        assert response.status_code == 200
+        assert response["ETag"] == etag
+    assert set(cache._cache) == keys
+
+
+def test_filter_params_are_part_of_key(ingredients, client_for):
+    client = client_for()
+    first = client.get("/api/ingredients/?name=Ингредиент 1")
+    second = client.get("/api/ingredients/?name=Ингредиент 2")
+    assert first["ETag"] != second["ETag"]
+    assert [item["name"] for item in second.json()] == ["Ингредиент 2"]
+    again = client.get("/api/ingredients/?name=Ингредиент 2&junk=1",
+                       HTTP_IF_NONE_MATCH=second["ETag"])
+    assert again.status_code == 304
@@ -0,0 +1,86 @@
+import pytest
+
+from recipes.cookable import CookableIndex
+from recipes.models import AmountIngredients, Ingredients
+
+PANTRIES = [[0], [0, 1], [1, 2, 3], [0, 2, 4, 5], [5, 6, 7], [3]]
+
+
+@pytest.fixture
+def pantry_ingredients(ingredients):
+    return ingredients + [
+        Ingredients.objects.create(name=f"Добавка {i}", measurement_unit="г")
+        for i in range(3)
+    ]
+
+
+def normalized(snapshot):
+    """Индекс без пустых групп и хвостовых нулей: сравнимый по значению"""
+    postings = {
+        ingredient_id: {
+            size: list(posting)
+            for size, posting in groups.items() if posting
+        }
+        for ingredient_id, groups in snapshot.postings.items()
+    }
+    sizes = list(snapshot.sizes)
+    while sizes and not sizes[-1]:
+        sizes.pop()
+    return (
+        {key: groups for key, groups in postings.items() if groups}, sizes
+    )
+
+
+def matches(index, pantry_ingredients):
+    results = []
+    for pantry in PANTRIES:
+        ids = [pantry_ingredients[i].id for i in pantry]
+        for max_missing in (0, 1, 2):
+            ranking = index.match(ids, max_missing)
+            results.append(ranking[0:len(ranking)])
+    return results
+
+
+def test_incremental_update_equals_full_build(
+    author, make_recipe, pantry_ingredients, django_capture_on_commit_callbacks
+):
+    extra = pantry_ingredients[5:]
+    first, second, third = (
+        make_recipe(author, name=f"Рецепт {i}") for i in range(3)
+    )
+    incremental = CookableIndex()
+    snapshot = CookableIndex._build("token", 0)
+
+    def change_ingredients(recipe):
+        item = AmountIngredients.objects.filter(recipe=recipe).first()
+        item.ingredients = extra[0]
+        item.save()
+
+    def create_recipe():
+        recipe = make_recipe(author, name="Новый рецепт")
+        AmountIngredients.objects.create(
+            recipe=recipe, ingredients=extra[2], amount=1)
+        return recipe
+
+    changes = [
+        (first, lambda: AmountIngredients.objects.create(
+            recipe=first, ingredients=extra[1], amount=1)),
+        (second, lambda: AmountIngredients.objects.filter(
+            recipe=second).first().delete()),
+        (third, lambda: change_ingredients(third)),
+        (second, lambda: AmountIngredients.objects.filter(
+            recipe=second).delete()),
+        (None, create_recipe),
+        (first, lambda: first.delete()),
+    ]
+    matches(incremental, pantry_ingredients)
+    for sequence, (recipe, change) in enumerate(changes, 1):
+        recipe_id = recipe.id if recipe is not None else None
+        with django_capture_on_commit_callbacks(execute=True):
+            created = change()
+        recipe_id = recipe_id or created.id
+        snapshot = CookableIndex._apply(snapshot, sequence, {recipe_id})
+        assert normalized(snapshot) == normalized(
+            CookableIndex._build("token", sequence))
+        assert matches(incremental, pantry_ingredients) == matches(
+            CookableIndex(), pantry_ingredients)
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from recipes.models import FeedItem, Recipes
+
+PAGE_SIZE = 2
+
+
+@pytest.fixture
+def celebrity(make_user):
+    return make_user("celebrity")
+
+
+@pytest.fixture
+def publish(make_recipe, django_capture_on_commit_callbacks):
+    def publish(author, name, published=None):
+        with django_capture_on_commit_callbacks(execute=True):
+            recipe = make_recipe(author, name=name)
+        if published is not None:
+            Recipes.objects.filter(pk=recipe.pk).update(published=published)
+            FeedItem.objects.filter(recipe=recipe).update(published=published)
+        return recipe
+    return publish
+
+
+def subscribe(client, author):
+    response = client.post(f"/api/users/{author.id}/subscribe/")
+    assert response.status_code == 201
+
+
+def read_feed(client):
+    """Все страницы ленты по курсору next"""
+    ids, url, pages = [], f"/api/recipes/feed/?limit={PAGE_SIZE}", 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["results"]) <= PAGE_SIZE
+        ids.extend(recipe["id"] for recipe in data["results"])
+        url, pages = data["next"], pages + 1
+    return ids, pages
+
+
+def test_fan_out_to_followers(user, author, make_user, publish, client_for):
+    other = make_user("other")
+    subscribe(client_for(user), author)
+    recipe = publish(author, "Новый рецепт")
+    assert list(FeedItem.objects.filter(recipe=recipe).values_list(
+        "user_id", flat=True)) == [user.id]
+    assert not FeedItem.objects.filter(user=other).exists()
+
+
+def test_pull_author_is_not_fanned_out(user, celebrity, make_user, publish,
+                                       client_for, settings):
+    settings.FEED_FANOUT_LIMIT = 1
+    subscribe(client_for(user), celebrity)
+    subscribe(client_for(make_user("fan")), celebrity)
+    recipe = publish(celebrity, "Рецепт знаменитости")
+    assert not FeedItem.objects.filter(recipe=recipe).exists()
+    ids, _ = read_feed(client_for(user))
+    assert ids == [recipe.id]
+
+
+def test_keyset_pagination(user, author, celebrity, make_user, publish,
+                           client_for, settings):
+    settings.FEED_FANOUT_LIMIT = 1
+    client = client_for(user)
+    subscribe(client, author)
+    subscribe(client, celebrity)
+    subscribe(client_for(make_user("fan")), celebrity)
+    now = timezone.now()
+    same_time = now - timedelta(hours=1)
+    recipes = [
+        publish(author, "Рецепт 1", now - timedelta(hours=3)),
+        publish(celebrity, "Рецепт 2", now - timedelta(hours=2)),
+        publish(author, "Рецепт 3", same_time),
+        publish(celebrity, "Рецепт 4", same_time),
+        publish(author, "Рецепт 5", same_time),
+        publish(author, "Рецепт 6", now),
+    ]
+    expected = [
+        recipe.id for recipe in sorted(
+            Recipes.objects.filter(pk__in=[r.id for r in recipes]),
+            key=lambda recipe: (recipe.published, recipe.id), reverse=True,
+        )
+    ]
+    ids, pages = read_feed(client)
+    assert ids == expected
+    assert pages == 3
+
+
+def test_invalid_cursor(user, client_for):
+    response = client_for(user).get("/api/recipes/feed/?cursor=broken")
+    assert response.status_code == 404
+
+
+def test_unfollow_trims_feed(user, author, make_user, publish, client_for):
+    other_author = make_user("other_author")
+    client = client_for(user)
+    subscribe(client, author)
+    subscribe(client, other_author)
+    publish(author, "Рецепт автора")
+    kept = publish(other_author, "Рецепт другого автора")
+    assert FeedItem.objects.filter(user=user).count() == 2
+    response = client.delete(f"/api/users/{author.id}/subscribe/")
+    assert response.status_code == 204
+    assert not FeedItem.objects.filter(user=user, author=author).exists()
+    assert read_feed(client)[0] == [kept.id]
@@ -0,0 +1,83 @@
+import base64
+import io
+
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from recipes.images import get_image_format
+from recipes.models import Recipes
+
+EXTENSIONS = {"WEBP": ".webp", "JPEG": ".jpg"}
+
+
+def jpeg_with_exif(size=(2000, 1500)):
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x010E] = "Описание с геометкой"
+    Image.new("RGB", size, (10, 200, 10)).save(
+        buffer, "JPEG", exif=exif.tobytes())
+    return "data:image/jpeg;base64," + base64.b64encode(
+        buffer.getvalue()).decode()
+
+
+def recipe_payload(tags, ingredients, image):
+    return {
+        "ingredients": [{"id": ingredients[0].id, "amount": 2}],
+        "tags": [tags[0].id],
+        "image": image,
+        "name": "Рецепт с картинкой",
+        "text": "Описание",
+        "cooking_time": 5,
+    }
+
+
+def test_renditions_exist_after_commit(author, tags, ingredients, client_for,
+                                       django_capture_on_commit_callbacks):
+    client = client_for(author)
+    payload = recipe_payload(tags, ingredients, jpeg_with_exif())
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post("/api/recipes/", payload, format="json")
+    assert response.status_code == 201, response.content
+    renditions = Recipes.objects.get(pk=response.json()["id"]).renditions
+    assert set(renditions) == {"thumbnail", "card", "detail"}
+    image_format = get_image_format()
+    for name, path in renditions.items():
+        assert path.endswith(EXTENSIONS[image_format])
+        with default_storage.open(path) as file, Image.open(file) as image:
+            assert image.format == image_format
+            assert not dict(image.getexif())
+            if name == "card":
+                assert image.size == (600, 400)
+    detail = client.get(f"/api/recipes/{response.json()['id']}/").json()
+    assert detail["images"]["card"].endswith(renditions["card"])
+
+
+def test_response_has_renditions(transactional_db, author, tags, ingredients,
+                                 client_for):
+    """Без внешней транзакции версии строятся до ответа на POST"""
+    response = client_for(author).post(
+        "/api/recipes/",
+        recipe_payload(tags, ingredients, jpeg_with_exif((64, 48))),
+        format="json",
+    )
+    assert response.status_code == 201, response.content
+    images = response.json()["images"]
+    assert images["card"] != response.json()["image"]
+    assert images["card"].endswith(EXTENSIONS[get_image_format()])
+
+
+def test_renditions_are_not_built_before_commit(
+    author, tags, ingredients, client_for, django_capture_on_commit_callbacks
+):
+    client = client_for(author)
+    payload = recipe_payload(tags, ingredients, jpeg_with_exif((64, 48)))
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        response = client.post("/api/recipes/", payload, format="json")
+    assert response.status_code == 201
+    recipe = Recipes.objects.get(pk=response.json()["id"])
+    assert not recipe.renditions
+    assert response.json()["images"]["card"] == response.json()["image"]
+    for callback in callbacks:
+        callback()
+    recipe.refresh_from_db()
+    assert recipe.renditions
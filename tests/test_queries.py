@@ -0,0 +1,45 @@
+import pytest
+from django.core.cache import cache
+
+from recipes.models import Favorite, ShoppingList
+from users.models import Follow
+
+# Запросов к базе на страницу при пустом кэше: не зависит от её размера
+LIST_QUERIES = 8
+DETAIL_QUERIES = 7
+RECIPES = 100
+
+
+@pytest.fixture
+def recipes(user, author, make_recipe):
+    recipes = [
+        make_recipe(author, name=f"Рецепт {i}") for i in range(RECIPES)
+    ]
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    ShoppingList.objects.create(user=user, recipe=recipes[1])
+    Follow.objects.create(user=user, author=author)
+    return recipes
+
+
+@pytest.fixture(params=["anonymous", "authenticated"])
+def client(request, user, client_for):
+    if request.param == "anonymous":
+        return client_for()
+    return client_for(user)
+
+
+@pytest.mark.parametrize("limit", [6, 100])
+def test_list_queries(recipes, client, django_assert_max_num_queries, limit):
+    cache.clear()
+    with django_assert_max_num_queries(LIST_QUERIES):
+        response = client.get(f"/api/recipes/?limit={limit}")
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == limit
+
+
+def test_retrieve_queries(recipes, client, django_assert_max_num_queries):
+    for recipe in (recipes[0], recipes[-1]):
+        cache.clear()
+        with django_assert_max_num_queries(DETAIL_QUERIES):
+            response = client.get(f"/api/recipes/{recipe.id}/")
+        assert response.status_code == 200
@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+from django.db import connections
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, ShoppingList, ShoppingListItem
+from recipes.shopping import rebuild_shopping_lists
+from users.models import Follow
+
+THREADS = 8
+
+
+@pytest.fixture
+def concurrent(transactional_db):
+    """Потоки видят данные теста только после фиксации транзакции"""
+
+
+def send_concurrently(users, method, url):
+    """Запрос от каждого пользователя, все потоки одновременно"""
+    barrier = threading.Barrier(len(users))
+    codes = []
+
+    def send(user):
+        client = APIClient()
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            codes.append(getattr(client, method)(url).status_code)
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=send, args=(user,)) for user in users
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(codes)
+
+
+@pytest.fixture
+def followers(make_user):
+    return [make_user(f"follower{i}") for i in range(THREADS)]
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        "ingredients_id", "amount"))
+
+
+def assert_consistent(user, recipe, author):
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    assert recipe.favorites_count == Favorite.objects.filter(
+        recipe=recipe).count()
+    assert recipe.shopping_carts_count == ShoppingList.objects.filter(
+        recipe=recipe).count()
+    assert author.followers_count == Follow.objects.filter(
+        author=author).count()
+    items = shopping_list(user)
+    rebuild_shopping_lists([user.id])
+    assert items == shopping_list(user)
+
+
+@pytest.mark.parametrize("relation", ["favorite", "shopping_cart"])
+def test_double_post_recipe_relation(concurrent, user, author, recipe,
+                                     relation):
+    url = f"/api/recipes/{recipe.id}/{relation}/"
+    codes = send_concurrently([user] * THREADS, "post", url)
+    assert codes == [201] + [400] * (THREADS - 1)
+    assert_consistent(user, recipe, author)
+
+
+@pytest.mark.parametrize("relation", ["favorite", "shopping_cart"])
+def test_double_delete_recipe_relation(concurrent, user, author, recipe,
+                                       client_for, relation):
+    url = f"/api/recipes/{recipe.id}/{relation}/"
+    assert client_for(user).post(url).status_code == 201
+    codes = send_concurrently([user] * THREADS, "delete", url)
+    assert codes == [204] + [400] * (THREADS - 1)
+    assert_consistent(user, recipe, author)
+    assert not shopping_list(user)
+
+
+def test_double_subscribe(concurrent, user, author, recipe, client_for):
+    url = f"/api/users/{author.id}/subscribe/"
+    codes = send_concurrently([user] * THREADS, "post", url)
+    assert codes == [201] + [400] * (THREADS - 1)
+    assert_consistent(user, recipe, author)
+    codes = send_concurrently([user] * THREADS, "delete", url)
+    assert codes == [204] + [400] * (THREADS - 1)
+    assert_consistent(user, recipe, author)
+
+
+@pytest.mark.parametrize("relation, field", [
+    ("favorite", "favorites_count"),
+    ("shopping_cart", "shopping_carts_count"),
+])
+def test_different_users_toggle_recipe(concurrent, followers, author, recipe,
+                                       relation, field):
+    url = f"/api/recipes/{recipe.id}/{relation}/"
+    assert send_concurrently(followers, "post", url) == [201] * THREADS
+    recipe.refresh_from_db()
+    assert getattr(recipe, field) == THREADS
+    assert send_concurrently(followers, "delete", url) == [204] * THREADS
+    recipe.refresh_from_db()
+    assert getattr(recipe, field) == 0
+    for follower in followers:
+        assert_consistent(follower, recipe, author)
+
+
+def test_different_users_subscribe(concurrent, followers, author, recipe):
+    url = f"/api/users/{author.id}/subscribe/"
+    assert send_concurrently(followers, "post", url) == [201] * THREADS
+    author.refresh_from_db()
+    assert author.followers_count == THREADS
+    assert send_concurrently(followers, "delete", url) == [204] * THREADS
+    author.refresh_from_db()
+    assert author.followers_count == 0
@@ -0,0 +1,49 @@
+import pytest
+from django.db import NotSupportedError, connection
+
+from recipes.models import Favorite
+from recipes.returning import delete_returning, insert_ignoring_conflicts
+
+
+@pytest.fixture
+def recipes(author, make_recipe):
+    return [make_recipe(author, name=f"Рецепт {i}") for i in range(3)]
+
+
+def favorites(user, recipes):
+    return [Favorite(user=user, recipe=recipe) for recipe in recipes]
+
+
+def test_insert_returns_only_new_rows(user, recipes):
+    first, second, third = recipes
+    assert insert_ignoring_conflicts(
+        favorites(user, [first]), "recipe") == [first.id]
+    created = insert_ignoring_conflicts(
+        favorites(user, recipes), "recipe")
+    assert sorted(created) == [second.id, third.id]
+    assert insert_ignoring_conflicts(favorites(user, recipes), "recipe") == []
+    assert Favorite.objects.filter(user=user).count() == 3
+    assert insert_ignoring_conflicts([], "recipe") == []
+
+
+def test_delete_returns_only_removed_rows(user, author, recipes):
+    Favorite.objects.bulk_create(
+        favorites(user, recipes) + favorites(author, recipes))
+    first, second, third = recipes
+    queryset = Favorite.objects.filter(
+        user=user, recipe__in=[first.id, second.id])
+    assert sorted(delete_returning(queryset, "recipe")) == [
+        first.id, second.id]
+    assert delete_returning(queryset, "recipe") == []
+    assert list(Favorite.objects.filter(user=user).values_list(
+        "recipe", flat=True)) == [third.id]
+    assert Favorite.objects.filter(user=author).count() == 3
+
+
+def test_unsupported_database(user, recipes, monkeypatch):
+    monkeypatch.setattr(connection, "vendor", "mysql")
+    with pytest.raises(NotSupportedError):
+        insert_ignoring_conflicts(favorites(user, recipes), "recipe")
+    with pytest.raises(NotSupportedError):
+        delete_returning(Favorite.objects.all(), "recipe")
+    assert not Favorite.objects.exists()
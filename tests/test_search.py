@@ -0,0 +1,56 @@
+import pytest
+
+from recipes.models import AmountIngredients, Ingredients, Recipes
+from recipes.search import refresh_search_documents
+
+
+@pytest.fixture
+def searchable(author, make_recipe):
+    recipes = {
+        "pancakes": make_recipe(author, name="Блины на молоке"),
+        "cake": make_recipe(author, name="Торт «Наполеон»"),
+        "salad": make_recipe(author, name="Салат с ёжевикой"),
+    }
+    Recipes.objects.filter(pk=recipes["cake"].pk).update(
+        text="Коржи подают с блинами и ежевичным вареньем")
+    hedgehog = Ingredients.objects.create(
+        name="Ёжевика садовая", measurement_unit="г")
+    AmountIngredients.objects.create(
+        recipe=recipes["cake"], ingredients=hedgehog, amount=1)
+    refresh_search_documents([recipe.pk for recipe in recipes.values()])
+    return recipes
+
+
+def search(client, query):
+    response = client.get("/api/recipes/", {"search": query, "limit": 50})
+    assert response.status_code == 200
+    return [recipe["id"] for recipe in response.json()["results"]]
+
+
+def test_sqlite_fallback_ranks_name_first(searchable, client_for):
+    client = client_for()
+    assert search(client, "блин") == [
+        searchable["pancakes"].id, searchable["cake"].id]
+
+
+@pytest.mark.parametrize("query", ["ежевик", "ЁЖЕВИК", "ёжевик"])
+def test_sqlite_fallback_folds_case_and_yo(searchable, client_for, query):
+    assert search(client_for(), query) == [
+        searchable["salad"].id, searchable["cake"].id]
+
+
+def test_sqlite_fallback_requires_every_word(searchable, client_for):
+    client = client_for()
+    assert search(client, "блины молоке") == [searchable["pancakes"].id]
+    assert search(client, "блины торт") == []
+
+
+def test_empty_query_keeps_all_recipes(searchable, client_for):
+    assert len(search(client_for(), "   ")) == len(searchable)
+
+
+def test_ingredient_rename_refreshes_documents(searchable, client_for):
+    ingredient = Ingredients.objects.get(name="Ёжевика садовая")
+    ingredient.name = "Крыжовник"
+    ingredient.save()
+    assert search(client_for(), "крыжовник") == [searchable["cake"].id]
@@ -0,0 +1,52 @@
+import pytest
+
+URL = "/api/recipes/download_shopping_cart/"
+
+
+@pytest.fixture
+def cart_client(user, recipe, client_for):
+    client = client_for(user)
+    response = client.post(f"/api/recipes/{recipe.id}/shopping_cart/")
+    assert response.status_code == 201
+    return client
+
+
+@pytest.fixture
+def commit(django_capture_on_commit_callbacks):
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+def content(response):
+    return b"".join(response.streaming_content).decode()
+
+
+def test_download_is_private_and_conditional(cart_client):
+    response = cart_client.get(URL)
+    assert response.status_code == 200
+    assert "Ингредиент 0" in content(response)
+    cache_control = response["Cache-Control"]
+    assert "private" in cache_control and "public" not in cache_control
+    not_modified = cart_client.get(URL, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert not_modified.status_code == 304
+    assert "private" in not_modified["Cache-Control"]
+
+
+def test_ingredient_rename_changes_validators(cart_client, ingredients,
+                                              commit):
+    response = cart_client.get(URL)
+    ingredient = ingredients[0]
+    ingredient.name = "Переименованный"
+    ingredient.measurement_unit = "кг"
+    with commit():
+        ingredient.save()
+    fresh = cart_client.get(URL, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert fresh.status_code == 200
+    assert fresh["ETag"] != response["ETag"]
+    assert "Переименованный" in content(fresh)
+
+
+def test_cart_change_changes_validators(cart_client, author, make_recipe):
+    etag = cart_client.get(URL)["ETag"]
+    other = make_recipe(author, name="Второй рецепт")
+    cart_client.post(f"/api/recipes/{other.id}/shopping_cart/")
+    assert cart_client.get(URL, HTTP_IF_NONE_MATCH=etag).status_code == 200
@@ -0,0 +1,28 @@
+from recipes.models import Recipes
+from recipes.synthetic import Scale, generate
+
+SCALE = Scale(users=10, recipes=60, ingredients_per_recipe=3, follows=2,
+              favorites=2, carts=1)
+
+
+def test_generate(tags, ingredients, make_user):
+    make_user("synthetic_foo")
+    user_ids, recipe_ids = generate(
+        SCALE, seed=1, batch_size=25, derived=False)
+    assert len(user_ids) == SCALE.users
+    assert len(recipe_ids) == SCALE.recipes
+    published = list(Recipes.objects.filter(
+        pk__in=recipe_ids).values_list("published", flat=True))
+    assert len(set(published)) > SCALE.recipes // 2
+    assert (max(published) - min(published)).days > 30
+
+
+def test_rerun_keeps_earlier_recipes(tags, ingredients):
+    _, first_ids = generate(SCALE, seed=1, batch_size=25, derived=False)
+    before = dict(Recipes.objects.values_list("pk", "published"))
+    user_ids, second_ids = generate(
+        SCALE, seed=2, batch_size=25, derived=False)
+    assert len(user_ids) == SCALE.users
+    assert not set(first_ids) & set(second_ids)
+    assert dict(Recipes.objects.filter(
+        pk__in=first_ids).values_list("pk", "published")) == before
@@ -0,0 +1,69 @@
+import pytest
+
+from recipes.units import merge_units, normalize_unit
+
+NAME = "ingredients__name"
+UNIT = "ingredients__measurement_unit"
+AMOUNT = "amount"
+
+
+def rows(*items):
+    return [{NAME: name, UNIT: unit, AMOUNT: amount}
+            for name, unit, amount in items]
+
+
+@pytest.mark.parametrize("items, expected", [
+    # совместимые единицы переводятся в базовую
+    ([("сахар", "г", 200), ("сахар", "кг", 0.5)],
+     [("сахар", "г", 700)]),
+    # набралась крупная единица
+    ([("мука", "г", 600), ("мука", "кг", 1)],
+     [("мука", "кг", 1.6)]),
+    ([("молоко", "стакан", 2), ("молоко", "ст. л.", 2),
+      ("молоко", "ч. л.", 1)],
+     [("молоко", "мл", 535)]),
+    ([("вода", "л", 1), ("вода", "мл", 500)],
+     [("вода", "л", 1.5)]),
+    ([("уксус", "капля", 3)],
+     [("уксус", "мл", 0.15)]),
+    # названия сравниваются без регистра, лишних пробелов и ё
+    ([("Сахар", "г", 100), ("  сахар ", "г", 50)],
+     [("Сахар", "г", 150)]),
+    ([("Ёжевика", "г", 10), ("ежевика", "г", 5)],
+     [("Ёжевика", "г", 15)]),
+    # единицы разной размерности не складываются
+    ([("масло", "г", 100), ("масло", "мл", 30)],
+     [("масло", "г", 100), ("масло", "мл", 30)]),
+    # неизвестные единицы складываются только сами с собой
+    ([("яйца", "шт.", 2), ("яйца", "штука", 3), ("яйца", "г", 50)],
+     [("яйца", "г", 50), ("яйца", "шт.", 5)]),
+    ([("соль", "по вкусу", 1), ("соль", "щепотка", 2),
+      ("соль", "по вкусу", 1)],
+     [("соль", "по вкусу", 2), ("соль", "щепотка", 2)]),
+    # псевдонимы единиц
+    ([("сахар", "гр.", 100), ("сахар", "Столовая  ложка", 1)],
+     [("сахар", "г", 100), ("сахар", "мл", 15)]),
+    ([], []),
+])
+def test_merge_units(items, expected):
+    assert merge_units(rows(*items)) == rows(*expected)
+
+
+def test_merge_units_custom_fields():
+    merged = merge_units(
+        [{"name": "сахар", "unit": "кг", "total": 2}],
+        name_field="name", unit_field="unit", amount_field="total",
+    )
+    assert merged == [{"name": "сахар", "unit": "кг", "total": 2}]
+
+
+@pytest.mark.parametrize("unit, expected", [
+    ("гр", "г"),
+    (" Кг. ", "кг"),
+    ("ч.л.", "ч. л."),
+    ("столовая   ложка", "ст. л."),
+    ("пучок", "пучок"),
+    (None, ""),
+])
+def test_normalize_unit(unit, expected):
+    assert normalize_unit(unit) == expected